@@ -110,10 +110,14 @@ class AutomationExecutor {
       'Password Reset': {
         script: 'password_reset.py',
         description: 'Automated password reset',
+        requires_user_email: true,
         parameters: {
           reset_type: 'self_service',
           notify_user: true,
-          force_change: false
+          force_change: false,
+          batch_size: 50,
+          pool_size: 4,
+          rate_limit_per_second: 200
         }
       }
     };
@@ -137,6 +141,11 @@ class AutomationExecutor {
         timestamp: new Date().toISOString()
       };
 
+      // Scripts acting on the ticket's user need their email, not just the ID
+      if (scriptConfig.requires_user_email) {
+        scriptParameters.user_email = await this.resolveUserEmail(ticket);
+      }
+
       const options = {
         mode: 'text',
         pythonOptions: ['-u'],
@@ -171,6 +180,21 @@ class AutomationExecutor {
     }
   }
 
+  // Resolve the email of the user who raised the ticket
+  async resolveUserEmail(ticket) {
+    if (ticket.user_email) {
+      return ticket.user_email;
+    }
+    if (!ticket.user_id) {
+      throw new Error(`Ticket ${ticket.id} has no user to act on`);
+    }
+    const user = await db.getUserById(ticket.user_id);
+    if (!user?.email) {
+      throw new Error(`No email found for user ${ticket.user_id}`);
+    }
+    return user.email;
+  }
+
   // Parse script output to extract structured data
   parseScriptOutput(output) {
     try {
@@ -429,7 +453,12 @@ class AutomationExecutor {
         parameters: {
           reset_type: 'string',
           notify_user: 'boolean',
-          force_change: 'boolean'
+          force_change: 'boolean',
+          users: 'array',
+          backend: 'string',
+          batch_size: 'number',
+          pool_size: 'number',
+          rate_limit_per_second: 'number'
         }
       }
     ];
@@ -8,8 +8,13 @@ import sys
 import subprocess
 import platform
 import time
+import os
+import contextlib
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'scripts'))
+from password_reset import PasswordReset
+
 def log_action(action, ticket_id):
     """Log automation actions"""
     timestamp = datetime.now().isoformat()
@@ -29,11 +34,27 @@ def restart_service(service_name):
     time.sleep(3)  # Simulate work
     return {"action": "restart_service", "service": service_name, "status": "success", "message": f"Service {service_name} restarted"}
 
-def reset_password(user_email):
-    """Reset user password (mock implementation)"""
-    log_action(f"Resetting password for: {user_email}", "unknown")
-    time.sleep(2)  # Simulate work
-    return {"action": "reset_password", "email": user_email, "status": "success", "message": "Password reset link sent"}
+def reset_password(user_emails, options=None):
+    """Reset passwords for one or more users via the password reset engine"""
+    if isinstance(user_emails, str):
+        user_emails = [user_emails]
+    user_emails = [email for email in (user_emails or []) if email]
+    if not user_emails:
+        return {"action": "reset_password", "email": None, "status": "failed",
+                "message": "No users supplied for password reset"}
+    log_action(f"Resetting password for: {', '.join(user_emails)}", "unknown")
+    params = dict(options or {})
+    params['users'] = user_emails
+    # Keep the engine's progress lines off stdout, which carries the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        result = PasswordReset().reset_passwords(params)
+    return {
+        "action": "reset_password",
+        "email": user_emails[0] if len(user_emails) == 1 else None,
+        "status": "success" if result.get("success") else "failed",
+        "message": "Password reset completed" if result.get("success") else result.get("error", "Some resets failed"),
+        "data": {"summary": result.get("summary"), "results": result.get("results")}
+    }
 
 def check_network_connectivity():
     """Check network connectivity (mock implementation)"""
@@ -89,8 +110,8 @@ def main():
             service_name = parameters.get('service_name', 'web_server')
             result = restart_service(service_name)
         elif action == "reset_password":
-            user_email = parameters.get('user_email', 'user@example.com')
-            result = reset_password(user_email)
+            user_emails = parameters.get('users') or parameters.get('user_email')
+            result = reset_password(user_emails, parameters)
         elif action == "check_network":
             result = check_network_connectivity()
         elif action == "diagnose":
@@ -91,6 +91,23 @@ class SupabaseDB {
     }
   }
 
+  // Get user by ID
+  async getUserById(id) {
+    try {
+      const { data, error } = await supabase
+        .from('users')
+        .select('id, email, name')
+        .eq('id', id)
+        .single();
+
+      if (error) throw error;
+      return data;
+    } catch (error) {
+      console.error('Error fetching user:', error);
+      throw error;
+    }
+  }
+
   // Create resolution
   async createResolution(resolutionData) {
     try {
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Cleanup Policy Engine
+Compiles include/exclude globs and protected paths for disk cleanup targets
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import fnmatch
+from datetime import datetime
+
+DEFAULT_LOG_PATTERNS = ["*.log", "*.out", "*.err"]
+
+
+def normalize_path(path):
+    """Case/separator-normalised path used for all matching"""
+    path = os.path.normcase(path)
+    if os.sep != '/':
+        path = path.replace(os.sep, '/')
+    return path
+
+
+def bracket_end(pattern, start):
+    """Index of the ']' closing the class opened at start, or -1 (a leading ']' or '!]' is literal)"""
+    i = start + 1
+    if i < len(pattern) and pattern[i] == '!':
+        i += 1
+    return pattern.find(']', i + 1)
+
+
+def class_to_regex(body):
+    """Regex for the body of a [...] class, sanitised as fnmatch.translate does.
+
+    Empty ranges such as ``9-0`` are dropped rather than failing to compile and
+    only ``!`` negates (a leading ``^`` is literal). A negated class never
+    matches '/', like '?'.
+    """
+    if '-' not in body:
+        body = body.replace('\\', '\\\\')
+    else:
+        chunks = []
+        i = 0
+        k = 2 if body[0] == '!' else 1  # A leading '-' is literal
+        while True:
+            k = body.find('-', k)
+            if k < 0:
+                break
+            chunks.append(body[i:k])
+            i = k + 1
+            k = k + 3
+        chunk = body[i:]
+        if chunk:
+            chunks.append(chunk)
+        else:
+            chunks[-1] += '-'
+        # Remove empty ranges -- invalid in RE
+        for k in range(len(chunks) - 1, 0, -1):
+            if chunks[k - 1][-1] > chunks[k][0]:
+                chunks[k - 1] = chunks[k - 1][:-1] + chunks[k][1:]
+                del chunks[k]
+        body = '-'.join(c.replace('\\', '\\\\').replace('-', '\\-') for c in chunks)
+    # Escape set operations (&&, ~~ and ||)
+    body = re.sub(r'([&~|])', r'\\\1', body)
+    if not body:
+        return '(?!)'  # Empty range: never match
+    if body == '!':
+        return '[^/]'  # Negated empty range: any character
+    if body[0] == '!':
+        # '/' goes last: a leading ']' must stay first to be literal
+        return '[^' + body[1:] + '/]'
+    if body[0] in ('^', '['):
+        body = '\\' + body
+    return '[' + body + ']'
+
+
+def glob_to_regex(pattern):
+    """Translate a glob to a regex body ('**' crosses directories, '*' does not)"""
+    i, n = 0, len(pattern)
+    parts = []
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern[i:i + 3] == '**/':
+                parts.append('(?:.*/)?')
+                i += 3
+                continue
+            if pattern[i:i + 2] == '**':
+                parts.append('.*')
+                i += 2
+                continue
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = bracket_end(pattern, i)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                parts.append(class_to_regex(pattern[i + 1:end]))
+                i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+def split_glob(pattern):
+    """Split a glob into (is_literal, text) tokens; a [...] class is one wildcard token"""
+    tokens = []
+    literal = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c in '*?':
+            j = i
+            while j < n and pattern[j] in '*?':
+                j += 1
+        elif c == '[' and bracket_end(pattern, i) != -1:
+            j = bracket_end(pattern, i) + 1
+        else:
+            literal.append(c)
+            i += 1
+            continue
+        if literal:
+            tokens.append((True, ''.join(literal)))
+            literal = []
+        tokens.append((False, pattern[i:j]))
+        i = j
+    if literal:
+        tokens.append((True, ''.join(literal)))
+    return tokens
+
+
+def literal_head(pattern):
+    """Literal text before the first wildcard"""
+    tokens = split_glob(pattern)
+    return tokens[0][1] if tokens and tokens[0][0] else ''
+
+
+def literal_tail(pattern):
+    """Literal text after the last wildcard (bracket contents are not wildcards)"""
+    tokens = split_glob(pattern)
+    return tokens[-1][1] if tokens and tokens[-1][0] else ''
+
+
+def required_literals(tokens):
+    """Literal fragments every match must contain ('**/' may match nothing, so its '/' is optional)"""
+    literals = []
+    for i, (is_literal, text) in enumerate(tokens):
+        if not is_literal:
+            continue
+        if i and tokens[i - 1][1].endswith('**') and text.startswith('/'):
+            text = text[1:]
+        literals.append(text)
+    return literals
+
+
+def literal_components(tokens):
+    """Literal path components every match must contain as whole components"""
+    segments = []
+    raw, literal = '', True
+    for is_literal, text in tokens:
+        if not is_literal:
+            # A [...] class may contain '/' but never splits a component
+            raw, literal = raw + text, False
+            continue
+        parts = text.split('/')
+        raw += parts[0]
+        for part in parts[1:]:
+            segments.append((raw, literal))
+            raw, literal = part, True
+    segments.append((raw, literal))
+
+    components = set()
+    previous = None
+    for raw, literal in segments:
+        # After 'x**/' the optional '/' can be skipped, gluing this part onto x
+        glued = previous is not None and previous.endswith('**') and previous != '**'
+        if raw and literal and not glued:
+            components.add(raw)
+        previous = raw
+    return components
+
+
+class GlobIndex:
+    """Glob patterns indexed so a lookup only runs the few regexes that can match.
+
+    ``*<tail>`` patterns are a set lookup by suffix and literal patterns a set
+    lookup by value. Path patterns with a literal directory component are filed
+    under the least shared such component and found by splitting the candidate
+    on '/'. Every other pattern is filed under the least shared literal window
+    (up to ``KEY_LENGTH`` chars) and found by sliding over the candidate. Cost
+    therefore follows the candidate's length, not the number of patterns; only
+    patterns with no literal text at all share the fallback regex.
+    """
+
+    KEY_LENGTH = 4
+
+    def __init__(self, patterns, anchor_anywhere=False):
+        self.exact = set()
+        self.suffixes = set()
+        keyed = []
+        fallback = []
+        for pattern in patterns:
+            tokens = split_glob(pattern)
+            if not anchor_anywhere and len(tokens) == 1 and tokens[0][0]:
+                self.exact.add(pattern)
+                continue
+            if not anchor_anywhere and len(tokens) == 2 and tokens[0][1] == '*' and tokens[1][0]:
+                self.suffixes.add(tokens[1][1])
+                continue
+
+            body = glob_to_regex(pattern)
+            if anchor_anywhere and not pattern.startswith(('/', '**/')):
+                body = '(?:.*/)?' + body
+            components = literal_components(tokens)
+            if components:
+                keyed.append(("component", components, body))
+                continue
+            windows = self.windows(required_literals(tokens))
+            if windows:
+                keyed.append(("window", windows, body))
+            else:
+                fallback.append(body)
+
+        # File each pattern under its least shared key
+        frequency = {}
+        for kind, keys, body in keyed:
+            for key in keys:
+                frequency[kind, key] = frequency.get((kind, key), 0) + 1
+        grouped = {"component": {}, "window": {}}
+        for kind, keys, body in keyed:
+            key = min(keys, key=lambda k: (frequency[kind, k], -len(k), k))
+            grouped[kind].setdefault(key, []).append(body)
+
+        self.components = {key: combine(bodies) for key, bodies in grouped["component"].items()}
+        self.buckets = {key: combine(bodies) for key, bodies in grouped["window"].items()}
+        self.key_lengths = sorted({len(key) for key in self.buckets}, reverse=True)
+        self.suffix_lengths = sorted({len(tail) for tail in self.suffixes}, reverse=True)
+        self.fallback = combine(fallback) if fallback else None
+        self.size = len(patterns)
+
+    def windows(self, literals):
+        """Candidate window keys: every KEY_LENGTH slice, plus shorter fragments whole"""
+        size = self.KEY_LENGTH
+        windows = set()
+        for text in literals:
+            if len(text) >= size:
+                windows.update(text[i:i + size] for i in range(len(text) - size + 1))
+            elif text:
+                windows.add(text)
+        return windows
+
+    def match(self, value):
+        if value in self.exact:
+            return True
+        for length in self.suffix_lengths:
+            if length <= len(value) and value[-length:] in self.suffixes:
+                return True
+        if self.components:
+            for part in set(value.split('/')):
+                regex = self.components.get(part)
+                if regex is not None and regex.fullmatch(value):
+                    return True
+        if self.buckets:
+            buckets = self.buckets
+            tried = set()
+            for length in self.key_lengths:
+                for i in range(len(value) - length + 1):
+                    key = value[i:i + length]
+                    regex = buckets.get(key)
+                    if regex is not None and key not in tried:
+                        if regex.fullmatch(value):
+                            return True
+                        tried.add(key)
+        return bool(self.fallback and self.fallback.fullmatch(value))
+
+
+def combine(bodies):
+    """Compile regex bodies into a single alternation"""
+    return re.compile('|'.join(f'(?:{body})' for body in bodies), re.DOTALL)
+
+
+class PatternSet:
+    """Globs split into basename patterns and full-path patterns (those containing '/')"""
+
+    def __init__(self, patterns):
+        patterns = [normalize_path(p) for p in (patterns or [])]
+        self.patterns = patterns
+        self.names = GlobIndex([p for p in patterns if '/' not in p])
+        self.paths = GlobIndex([p for p in patterns if '/' in p], anchor_anywhere=True)
+
+    def __bool__(self):
+        return bool(self.patterns)
+
+    def match(self, path, name):
+        """Match a normalised path and its basename"""
+        return self.names.match(name) or (self.paths.size > 0 and self.paths.match(path))
+
+
+class PathTrie:
+    """Prefix trie of path components for protected paths"""
+
+    TERMINAL = object()
+
+    def __init__(self, paths=None):
+        self.root = {}
+        for path in paths or []:
+            self.insert(path)
+
+    @staticmethod
+    def split(path):
+        if path.startswith('~'):
+            path = os.path.expanduser(path)
+        if not os.path.isabs(path):
+            path = os.path.abspath(path)
+        path = normalize_path(path)
+        return [part for part in path.split('/') if part]
+
+    def insert(self, path):
+        node = self.root
+        for part in self.split(path):
+            node = node.setdefault(part, {})
+        node[self.TERMINAL] = True
+
+    def covers(self, path):
+        """True if path is a protected path or lies beneath one"""
+        node = self.root
+        if self.TERMINAL in node:
+            return True
+        for part in self.split(path):
+            node = node.get(part)
+            if node is None:
+                return False
+            if self.TERMINAL in node:
+                return True
+        return False
+
+    def contains(self, path):
+        """True if a protected path lies at or beneath path"""
+        node = self.root
+        for part in self.split(path):
+            node = node.get(part)
+            if node is None:
+                return False
+        return True
+
+    def __bool__(self):
+        return bool(self.root)
+
+
+class CleanupPolicy:
+    """Per-site cleanup policy.
+
+    ``include`` globs select log files; ``exclude`` globs and
+    ``protected_paths`` keep any file or directory (and its subtree) out of
+    every cleanup. ``min_age_days`` and the size bounds apply to logs.
+    """
+
+    def __init__(self, include=None, exclude=None, protected_paths=None,
+                 min_age_days=7, min_size_bytes=0, max_size_bytes=None,
+                 temp_paths=None, cache_paths=None, log_paths=None):
+        # The rules as given, e.g. to tell whether earlier progress still applies
+        self.settings = {
+            "include": include, "exclude": exclude, "protected_paths": protected_paths,
+            "min_age_days": min_age_days, "min_size_bytes": min_size_bytes,
+            "max_size_bytes": max_size_bytes, "temp_paths": temp_paths,
+            "cache_paths": cache_paths, "log_paths": log_paths
+        }
+        self.include = PatternSet(include if include is not None else DEFAULT_LOG_PATTERNS)
+        self.exclude = PatternSet(exclude)
+        self.protected = PathTrie(protected_paths)
+        self.min_age_days = min_age_days
+        self.min_size_bytes = min_size_bytes or 0
+        self.max_size_bytes = max_size_bytes
+        self.temp_paths = temp_paths
+        self.cache_paths = cache_paths
+        self.log_paths = log_paths
+
+    @classmethod
+    def from_params(cls, params):
+        """Build a policy from an optional policy_file plus inline 'policy' overrides"""
+        config = {}
+        if params.get('policy_file'):
+            with open(params['policy_file']) as f:
+                config.update(json.load(f))
+        config.update(params.get('policy') or {})
+        return cls(
+            include=config.get('include'),
+            exclude=config.get('exclude'),
+            protected_paths=config.get('protected_paths'),
+            min_age_days=config.get('min_age_days', params.get('log_days_old', 7)),
+            min_size_bytes=config.get('min_size_bytes', 0),
+            max_size_bytes=config.get('max_size_bytes'),
+            temp_paths=config.get('temp_paths'),
+            cache_paths=config.get('cache_paths'),
+            log_paths=config.get('log_paths')
+        )
+
+    def cutoff_time(self, now=None):
+        return (now or time.time()) - self.min_age_days * 24 * 60 * 60
+
+    def is_excluded(self, path, name=None):
+        """True if path is protected or matches an exclude pattern"""
+        if self.protected and self.protected.covers(path):
+            return True
+        if not self.exclude:
+            return False
+        path = normalize_path(path)
+        return self.exclude.match(path, os.path.normcase(name) if name is not None else path.rsplit('/', 1)[-1])
+
+    def match_log_name(self, path, name):
+        """Name/path part of the log rules (no stat needed)"""
+        normalized = normalize_path(path)
+        name = os.path.normcase(name)
+        if not self.include.match(normalized, name):
+            return False
+        if self.exclude and self.exclude.match(normalized, name):
+            return False
+        return not (self.protected and self.protected.covers(path))
+
+    def match_log_stat(self, stat, cutoff_time):
+        """Age and size part of the log rules"""
+        if stat.st_mtime >= cutoff_time or stat.st_size < self.min_size_bytes:
+            return False
+        return self.max_size_bytes is None or stat.st_size <= self.max_size_bytes
+
+
+def benchmark_patterns(count):
+    """Include/exclude globs of every shape the index handles, sized to count"""
+    include = list(DEFAULT_LOG_PATTERNS)
+    exclude = []
+    for i in range(count):
+        kind = i % 6
+        if kind == 0:
+            include.append(f"*.ext{i}")
+        elif kind == 1:
+            include.append(f"job-{i}*.log")
+        elif kind == 2:
+            include.append(f"*-{i}*.out")
+        elif kind == 3:
+            include.append(f"**/app{i}/*.trace")
+        elif kind == 4:
+            include.append(f"/var/log/app{i}/svc*/*.dmp")
+        else:
+            include.append(f"core.{i}")
+        kind = i % 3
+        if kind == 0:
+            exclude.append(f"**/app{i}/archive")
+        elif kind == 1:
+            exclude.append(f"*.keep{i}")
+        else:
+            exclude.append(f"**/svc{i}/*.log")
+    return include, exclude
+
+
+def benchmark(pattern_counts=(10, 100, 1000, 5000), path_count=20000):
+    """Time per-entry matching (files and directories) as the number of patterns grows"""
+    extensions = ["log", "out", "err", "trace", "dmp", "tmp", "keep3", "bak"]
+    paths = [f"/var/log/app{i % 600}/svc{i % 9}/job-{i}.{extensions[i % len(extensions)]}"
+             for i in range(path_count)]
+    directories = sorted({p.rsplit('/', 1)[0] for p in paths} | {p.rsplit('/', 2)[0] for p in paths}
+                         | {f"/var/log/app{i}/archive" for i in range(600)})
+    results = []
+    for count in pattern_counts:
+        include, exclude = benchmark_patterns(count)
+
+        start = time.perf_counter()
+        policy = CleanupPolicy(include=include, exclude=exclude,
+                               protected_paths=[f"/srv/keep{i}" for i in range(count)])
+        compile_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matched = sum(1 for p in paths if policy.match_log_name(p, p.rsplit('/', 1)[-1]))
+        file_ns = (time.perf_counter() - start) / len(paths) * 1e9
+
+        start = time.perf_counter()
+        pruned = sum(1 for d in directories if policy.is_excluded(d, d.rsplit('/', 1)[-1]))
+        dir_ns = (time.perf_counter() - start) / len(directories) * 1e9
+
+        # Baseline: try every pattern with fnmatch, on a sample to keep runtime sane
+        sample = paths[:max(50, path_count // max(1, count // 5))]
+        start = time.perf_counter()
+        for p in sample:
+            name = p.rsplit('/', 1)[-1]
+            (any(fnmatch.fnmatchcase(p if '/' in pat else name, pat) for pat in include)
+             and not any(fnmatch.fnmatchcase(p if '/' in pat else name, pat) for pat in exclude))
+        naive_ns = (time.perf_counter() - start) / len(sample) * 1e9
+
+        results.append({
+            "patterns": len(include) + len(exclude),
+            "compile_ms": round(compile_seconds * 1000, 2),
+            "file_ns": round(file_ns, 1),
+            "directory_ns": round(dir_ns, 1),
+            "fnmatch_file_ns": round(naive_ns, 1),
+            "files_matched": matched,
+            "directories_pruned": pruned
+        })
+    return results
+
+
+def main():
+    """Main function: runs the matching benchmark"""
+    try:
+        params = json.loads(sys.argv[1]) if len(sys.argv) > 1 else {}
+        results = benchmark(tuple(params.get('pattern_counts', (10, 100, 1000, 5000))),
+                            params.get('path_count', 20000))
+        print(json.dumps({
+            "success": True,
+            "benchmark": results,
+            "timestamp": datetime.now().isoformat()
+        }, indent=2))
+    except Exception as e:
+        print(json.dumps({
+            "success": False,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, indent=2))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -5,18 +5,375 @@ Cleans temporary files and frees up disk space
 """
 
 import os
+import re
+import stat
 import sys
 import json
 import shutil
 import tempfile
 import platform
 import time
+import threading
+import multiprocessing
+import gzip
+import lzma
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime
 
+from cleanup_policy import CleanupPolicy
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+SYS_DEV_BLOCK_PATH = "/sys/dev/block"
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}
+COMPRESSED_MAGIC = (b"\x1f\x8b", b"\xfd7zXZ\x00", b"\x28\xb5\x2f\xfd", b"BZh", b"PK\x03\x04")
+STREAM_CHUNK_SIZE = 1024 * 1024
+# Tree removal works relative to open directory fds where the OS allows it,
+# so a directory swapped for a symlink mid-walk is never followed
+SAFE_FD_REMOVAL = ({os.open, os.unlink, os.rmdir} <= os.supports_dir_fd
+                   and os.scandir in os.supports_fd)
+
+
+def unescape_mount_field(value):
+    """Decode the octal escapes (\\040 etc.) used in mountinfo fields"""
+    if '\\' not in value:
+        return value
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), value)
+
+
+def parse_mountinfo(path=MOUNTINFO_PATH):
+    """Parse mountinfo into {mount_point: mount} (later mounts shadow earlier ones)"""
+    mounts = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            try:
+                separator = fields.index('-')
+            except ValueError:
+                continue
+            mount_point = unescape_mount_field(fields[4])
+            mounts[mount_point] = {
+                "mount_point": mount_point,
+                "device_id": fields[2],
+                "fstype": fields[separator + 1],
+                "source": unescape_mount_field(fields[separator + 2]),
+            }
+    return mounts
+
+
+def block_device_id(source):
+    """major:minor of a mount source that is a block device node, else None"""
+    if not source or not source.startswith('/'):
+        return None
+    try:
+        st = os.stat(source)
+    except OSError:
+        return None
+    if not stat.S_ISBLK(st.st_mode):
+        return None
+    return f"{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}"
+
+
+def underlying_disks(sys_path, seen=None):
+    """Whole disks behind a /sys block node, following partitions and dm/md slaves"""
+    seen = set() if seen is None else seen
+    real = os.path.realpath(sys_path)
+    if real in seen:
+        return set()
+    seen.add(real)
+    if os.path.exists(os.path.join(real, "partition")):
+        real = os.path.dirname(real)
+    slaves_dir = os.path.join(real, "slaves")
+    slaves = os.listdir(slaves_dir) if os.path.isdir(slaves_dir) else []
+    if not slaves:
+        return {os.path.basename(real)}
+    disks = set()
+    for slave in slaves:
+        disks |= underlying_disks(os.path.join(slaves_dir, slave), seen)
+    return disks
+
+
+def physical_device(device_id, source=None):
+    """Resolve a mount to the disk(s) holding it, joined with ','.
+
+    Partitions map to their disk and LVM/dm/md volumes to the disks under
+    them. Filesystems with anonymous ids (btrfs subvolumes) are resolved
+    through their source device.
+    """
+    for candidate in (device_id, block_device_id(source)):
+        if not candidate:
+            continue
+        sys_path = os.path.join(SYS_DEV_BLOCK_PATH, candidate)
+        try:
+            if os.path.exists(sys_path):
+                return ",".join(sorted(underlying_disks(sys_path)))
+        except OSError:
+            pass
+    # Virtual filesystems (tmpfs, overlay, ...) are their own device
+    return device_id
+
+
+def group_by_disks(reports):
+    """Group mount reports so mounts sharing any disk land in the same group"""
+    groups = []
+    for report in reports:
+        disks = set(report["physical_device"].split(","))
+        members = [report]
+        for group in [g for g in groups if g[0] & disks]:
+            groups.remove(group)
+            disks |= group[0]
+            members = group[1] + members
+        groups.append((disks, members))
+    return {",".join(sorted(disks)): members for disks, members in groups}
+
+
+def open_archive(path, codec):
+    """Stream reader that decodes an archive written by compress_log_file"""
+    if codec == "gzip":
+        return gzip.open(path, 'rb')
+    if codec == "xz":
+        return lzma.open(path, 'rb')
+    import zstandard
+    return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                       closefd=True)
+
+
+def read_exactly(reader, size):
+    """Read size bytes from a stream that may return short reads (less only at EOF)"""
+    data = b""
+    while len(data) < size:
+        chunk = reader.read(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def archive_matches(archive, codec, original):
+    """True if archive decodes cleanly to exactly the contents of original"""
+    try:
+        with open_archive(archive, codec) as reader, open(original, 'rb') as src:
+            while True:
+                expected = src.read(STREAM_CHUNK_SIZE)
+                if not expected:
+                    return not reader.read(1)
+                if read_exactly(reader, len(expected)) != expected:
+                    return False
+    except Exception:
+        return False  # Truncated, corrupt or not this codec
+
+
+def fsync_directory(path):
+    """Make a rename in path durable (no-op where directories cannot be opened)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def compress_log_file(path, codec="gzip", level=None):
+    """Compress one log file in place; runs in a worker process.
+
+    The file is streamed through the encoder into a temp file next to it, which
+    is then renamed to ``path + suffix`` with the original owner, mode and mtime.
+    An existing ``path + suffix`` is never replaced: if it decodes to exactly
+    this file (a run died before removing ``path``) the original is removed,
+    otherwise the file is skipped.
+    """
+    suffix = COMPRESSION_SUFFIXES[codec]
+    output = path + suffix
+    result = {"path": path, "output": output, "bytes_before": 0, "bytes_after": 0,
+              "status": "skipped", "error": None}
+    tmp_path = None
+    try:
+        st = os.stat(path)
+        result["bytes_before"] = st.st_size
+        with open(path, 'rb') as src:
+            if src.read(6).startswith(COMPRESSED_MAGIC):
+                result["error"] = "already compressed"
+                return result
+            if os.path.lexists(output):
+                if not archive_matches(output, codec, path):
+                    result["error"] = f"{output} already exists and is not an archive of this file"
+                    return result
+                os.remove(path)
+                result["bytes_after"] = os.path.getsize(output)
+                result["status"] = "compressed"
+                return result
+            src.seek(0)
+            
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path),
+                                            prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+            with os.fdopen(fd, 'wb') as dst:
+                if codec == "gzip":
+                    with gzip.GzipFile(filename=os.path.basename(path), mode='wb', fileobj=dst,
+                                       compresslevel=6 if level is None else level, mtime=int(st.st_mtime)) as encoder:
+                        shutil.copyfileobj(src, encoder, STREAM_CHUNK_SIZE)
+                elif codec == "xz":
+                    with lzma.LZMAFile(dst, 'wb', preset=6 if level is None else level) as encoder:
+                        shutil.copyfileobj(src, encoder, STREAM_CHUNK_SIZE)
+                else:
+                    import zstandard
+                    zstandard.ZstdCompressor(level=3 if level is None else level).copy_stream(
+                        src, dst, read_size=STREAM_CHUNK_SIZE, write_size=STREAM_CHUNK_SIZE)
+                dst.flush()
+                os.fsync(dst.fileno())
+        
+        if hasattr(os, 'chown'):
+            # Keep e.g. syslog:adm ownership; failing here leaves the original untouched
+            os.chown(tmp_path, st.st_uid, st.st_gid)
+        shutil.copymode(path, tmp_path)
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        if os.path.lexists(output):
+            result["error"] = f"{output} appeared while compressing"
+            return result
+        os.replace(tmp_path, output)
+        tmp_path = None
+        # The archive must be durable before the only other copy goes away
+        fsync_directory(os.path.dirname(path) or '.')
+        os.remove(path)
+        result["bytes_after"] = os.path.getsize(output)
+        result["status"] = "compressed"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return result
+
+
+class CheckpointJournal:
+    """Append-only record of completed directories so an interrupted run can resume.
+
+    The first line is a ``{"settings": ...}`` header with the rules the run was
+    started under; a journal written under other settings is discarded. Each
+    following line is a JSON object ``{"task", "path", "scope", "bytes"}``. A
+    ``files`` record means the entries directly in ``path`` are handled; a
+    ``tree`` record is written once everything beneath it is done, so the whole
+    subtree can be skipped. Records are buffered and flushed by a background
+    timer every ``flush_interval`` seconds, or as soon as ``flush_every``
+    records are waiting. A finished run deletes the journal.
+    """
+
+    def __init__(self, path, settings=None, flush_interval=1.0, flush_every=256):
+        self.path = path
+        # Round-trip through JSON so tuples and lists compare equal to the header
+        self.settings = json.loads(json.dumps(settings or {}))
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.completed = set()
+        self.prior_bytes = {}
+        self.settings_changed = False
+        self.load()
+        self.resumed = bool(self.completed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A finished, missing or outdated journal starts over rather than growing forever
+        self.file = open(path, 'a' if self.resumed else 'w')
+        if self.resumed and self.torn:
+            # Terminate a line torn by a killed run so the next record is not glued onto it
+            self.file.write("\n")
+        if not self.resumed:
+            self.file.write(json.dumps({"settings": self.settings}) + "\n")
+            self.file.flush()
+        self.stopped = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+
+    def load(self):
+        self.torn = False
+        if not os.path.exists(self.path):
+            return
+        header_seen = False
+        with open(self.path) as f:
+            for line in f:
+                self.torn = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn write from a killed run
+                if "settings" in entry:
+                    header_seen = True
+                    if entry["settings"] != self.settings:
+                        self.settings_changed = True
+                        break
+                    continue
+                if not header_seen:
+                    # Written under unknown settings
+                    self.settings_changed = True
+                    break
+                if entry.get("complete"):
+                    self.completed.clear()
+                    self.prior_bytes.clear()
+                    continue
+                self.completed.add((entry["task"], entry["path"], entry.get("scope", "tree")))
+                self.prior_bytes[entry["task"]] = self.prior_bytes.get(entry["task"], 0) + entry.get("bytes", 0)
+        if self.settings_changed:
+            self.completed.clear()
+            self.prior_bytes.clear()
+
+    def is_done(self, task, path, scope="tree"):
+        return (task, path, scope) in self.completed
+
+    def mark_done(self, task, path, cleaned_bytes=0, scope="tree"):
+        with self.lock:
+            self.completed.add((task, path, scope))
+            self.buffer.append(json.dumps({"task": task, "path": path, "scope": scope,
+                                           "bytes": cleaned_bytes}) + "\n")
+            if len(self.buffer) >= self.flush_every:
+                self._flush()
+
+    def _flush_periodically(self):
+        # Long rmtrees and compressions can go a while without a mark_done
+        while not self.stopped.wait(self.flush_interval):
+            with self.lock:
+                self._flush()
+
+    def _flush(self):
+        if self.buffer:
+            self.file.write(''.join(self.buffer))
+            self.buffer = []
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self, complete=False):
+        self.stopped.set()
+        self.flusher.join()
+        with self.lock:
+            if complete:
+                # Kept only if the journal cannot be deleted, so a rerun still starts over
+                self.buffer.append(json.dumps({"complete": True}) + "\n")
+            self._flush()
+            self.file.close()
+        if complete:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def journal_path(checkpoint_dir, ticket_id):
+    """Journal file for a ticket"""
+    safe_id = re.sub(r'[^A-Za-z0-9_.-]', '_', str(ticket_id))
+    return os.path.join(checkpoint_dir, f"disk_cleanup_{safe_id}.jsonl")
+
+
 class DiskCleanup:
     def __init__(self):
         self.system = platform.system().lower()
         self.cleanup_results = []
+        self.log_lock = threading.Lock()
+        self.mounts = None
+        self.journal = None
+        self.log_mode = "delete"
+        self.compression = None
+        self.compress_pool = None
+        self.policy = CleanupPolicy()
         
     def log_action(self, action, details):
         """Log cleanup actions"""
@@ -26,15 +383,16 @@ class DiskCleanup:
             "action": action,
             "details": details
         }
-        self.cleanup_results.append(log_entry)
+        with self.log_lock:
+            self.cleanup_results.append(log_entry)
         print(f"[{timestamp}] {action}: {details}")
         
-    def get_disk_usage(self):
-        """Get current disk usage"""
+    def get_disk_usage(self, path='/'):
+        """Get current disk usage for the filesystem containing path"""
         try:
             if self.system == "windows":
                 import psutil
-                disk = psutil.disk_usage('/')
+                disk = psutil.disk_usage(path)
                 return {
                     "total": disk.total,
                     "used": disk.used,
@@ -42,7 +400,7 @@ class DiskCleanup:
                     "percent_used": (disk.used / disk.total) * 100
                 }
             else:
-                stat = os.statvfs('/')
+                stat = os.statvfs(path)
                 total = stat.f_blocks * stat.f_frsize
                 free = stat.f_bavail * stat.f_frsize
                 used = total - free
@@ -50,49 +408,385 @@ class DiskCleanup:
                     "total": total,
                     "used": used,
                     "free": free,
-                    "percent_used": (used / total) * 100
+                    "percent_used": (used / total) * 100 if total else 0.0
                 }
         except Exception as e:
-            self.log_action("error", f"Failed to get disk usage: {str(e)}")
+            self.log_action("error", f"Failed to get disk usage for {path}: {str(e)}")
             return None
     
+    def load_mounts(self):
+        """Parse the mount table once per run"""
+        if self.mounts is None:
+            try:
+                self.mounts = parse_mountinfo()
+            except (OSError, IndexError) as e:
+                if self.system != "windows":
+                    self.log_action("warning", f"Mount table unavailable, using drive roots: {str(e)}")
+                self.mounts = {}
+        return self.mounts
+    
+    def find_mount(self, path):
+        """Return the mount containing path (deepest matching mount point)"""
+        mounts = self.load_mounts()
+        current = os.path.realpath(path)
+        if not mounts:
+            root = os.path.splitdrive(current)[0] + os.sep
+            return {"mount_point": root, "device_id": root, "fstype": None, "source": root}
+        while current not in mounts:
+            parent = os.path.dirname(current)
+            if parent == current:
+                break
+            current = parent
+        return mounts.get(current) or {"mount_point": current, "device_id": current,
+                                       "fstype": None, "source": None}
+    
+    def get_temp_paths(self):
+        """Temporary directories to clean"""
+        if self.policy.temp_paths is not None:
+            return [os.path.expanduser(path) for path in self.policy.temp_paths]
+        paths = [tempfile.gettempdir()]
+        if self.system == "windows":
+            user_temp = os.environ.get('TEMP', 'C:\\Windows\\Temp')
+            if os.path.normcase(user_temp) != os.path.normcase(paths[0]):
+                paths.append(user_temp)
+        return paths
+    
+    def get_cache_paths(self):
+        """Common browser cache paths"""
+        if self.policy.cache_paths is not None:
+            return [os.path.expanduser(path) for path in self.policy.cache_paths]
+        home = os.path.expanduser("~")
+        return [
+            os.path.join(home, "AppData", "Local", "Google", "Chrome", "User Data", "Default", "Cache"),
+            os.path.join(home, "AppData", "Local", "Microsoft", "Edge", "User Data", "Default", "Cache"),
+            os.path.join(home, ".cache", "mozilla", "firefox"),
+            os.path.join(home, ".cache", "google-chrome")
+        ]
+    
+    def get_log_paths(self):
+        """Log directories to scan for old logs"""
+        if self.policy.log_paths is not None:
+            return [os.path.expanduser(path) for path in self.policy.log_paths]
+        if self.system == "windows":
+            return [
+                "C:\\Windows\\Logs",
+                "C:\\Windows\\debug",
+                "C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportArchive"
+            ]
+        return [
+            "/var/log",
+            os.path.expanduser("~/.local/share/logs")
+        ]
+    
+    def remove_tree(self, path, device):
+        """Delete a directory tree without leaving the filesystem it is on.
+        
+        Entries the policy excludes or protects and entries on another device
+        (nested mounts) are kept along with the directories above them.
+        Returns ``(bytes_removed, removed_all)``.
+        """
+        if not SAFE_FD_REMOVAL:
+            cleaned_size, complete = self.remove_tree_contents(path, path, device)
+        else:
+            st = os.lstat(path)
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+            try:
+                if not os.path.samestat(st, os.fstat(fd)):
+                    raise OSError(f"{path} changed during cleanup")
+                cleaned_size, complete = self.remove_tree_contents(fd, path, device)
+            finally:
+                os.close(fd)
+        if complete:
+            os.rmdir(path)
+        return cleaned_size, complete
+    
+    def remove_tree_contents(self, target, path, device):
+        """Bottom-up delete of one directory's entries, given its fd (or its path without fd support)"""
+        cleaned_size = 0
+        complete = True
+        dir_fd = target if SAFE_FD_REMOVAL else None
+        with os.scandir(target) as entries:
+            entries = list(entries)
+        for entry in entries:
+            child = os.path.join(path, entry.name)
+            name = entry.name if SAFE_FD_REMOVAL else child
+            if self.policy.is_excluded(child, entry.name):
+                complete = False
+                continue
+            try:
+                st = entry.stat(follow_symlinks=False)
+                if not stat.S_ISDIR(st.st_mode):
+                    os.unlink(name, dir_fd=dir_fd)
+                    cleaned_size += st.st_size
+                    continue
+                if st.st_dev != device:
+                    self.log_action("mount_skipped", f"Kept mount point: {child}")
+                    complete = False
+                    continue
+                if SAFE_FD_REMOVAL:
+                    # Open relative to the parent without following links, as rmtree does
+                    fd = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=dir_fd)
+                    try:
+                        if not os.path.samestat(st, os.fstat(fd)):
+                            raise OSError(f"{child} changed during cleanup")
+                        removed, child_complete = self.remove_tree_contents(fd, child, device)
+                    finally:
+                        os.close(fd)
+                else:
+                    removed, child_complete = self.remove_tree_contents(child, child, device)
+                cleaned_size += removed
+                if child_complete:
+                    os.rmdir(name, dir_fd=dir_fd)
+                else:
+                    complete = False
+            except OSError as e:
+                self.log_action("warning", f"Could not delete {child}: {str(e)}")
+                complete = False
+        return cleaned_size, complete
+    
+    def clean_temp_dir(self, temp_dir):
+        """Clean a single temporary directory"""
+        cleaned_size = 0
+        task = f"temp:{temp_dir}"
+        if not os.path.exists(temp_dir) or (self.journal and self.journal.is_done(task, temp_dir)):
+            return cleaned_size
+        device = os.stat(temp_dir).st_dev
+        
+        for item in os.listdir(temp_dir):
+            item_path = os.path.join(temp_dir, item)
+            if self.journal and (self.journal.path + os.sep).startswith(item_path + os.sep):
+                continue  # Never delete our own checkpoint journal
+            if self.policy.is_excluded(item_path, item):
+                continue
+            try:
+                item_stat = os.lstat(item_path)
+                # Other filesystems mounted inside the temp dir are not ours to clean
+                if item_stat.st_dev != device:
+                    self.log_action("mount_skipped", f"Kept mount point in temp directory: {item}")
+                    continue
+                if not stat.S_ISDIR(item_stat.st_mode):
+                    size = item_stat.st_size
+                    os.remove(item_path)
+                    self.log_action("file_deleted", f"Removed temp file: {item}")
+                else:
+                    size, complete = self.remove_tree(item_path, device)
+                    if complete:
+                        self.log_action("directory_deleted", f"Removed temp directory: {item}")
+                    else:
+                        self.log_action("directory_partially_deleted", 
+                                      f"Cleaned temp directory, kept excluded or mounted entries: {item}")
+                cleaned_size += size
+                if self.journal:
+                    self.journal.mark_done(task, item_path, size, scope="files")
+            except Exception as e:
+                self.log_action("warning", f"Could not delete {item_path}: {str(e)}")
+        
+        if self.journal:
+            self.journal.mark_done(task, temp_dir)
+        return cleaned_size
+    
+    def clean_cache_dir(self, cache_path):
+        """Remove a single browser cache directory"""
+        task = f"cache:{cache_path}"
+        if not os.path.exists(cache_path) or (self.journal and self.journal.is_done(task, cache_path)):
+            return 0
+        if self.policy.is_excluded(cache_path):
+            self.log_action("cache_protected", f"Kept browser cache covered by policy: {cache_path}")
+            return 0
+        
+        try:
+            cleaned_size, complete = self.remove_tree(cache_path, os.stat(cache_path).st_dev)
+            if complete:
+                self.log_action("cache_cleaned", f"Cleaned browser cache: {cache_path}")
+            else:
+                self.log_action("cache_partially_cleaned", 
+                              f"Cleaned browser cache, kept excluded or mounted entries: {cache_path}")
+            if self.journal:
+                self.journal.mark_done(task, cache_path, cleaned_size)
+            return cleaned_size
+        except Exception as e:
+            self.log_action("warning", f"Could not clean cache {cache_path}: {str(e)}")
+            return 0
+    
+    def clean_log_dir(self, log_path, cutoff_time):
+        """Delete logs older than cutoff_time under a single directory"""
+        if not os.path.exists(log_path) or self.policy.is_excluded(log_path):
+            return 0
+        task = f"logs:{log_path}"
+        # Compression jobs for the whole walk, keyed to the directory they belong to;
+        # the walk stays on the filesystem holding log_path
+        walk = {"futures": {}, "dirs": {}, "device": os.stat(log_path).st_dev}
+        cleaned_size = self.clean_log_tree(task, log_path, cutoff_time, walk)
+        return cleaned_size + self.collect_compressed(task, walk)
+    
+    def clean_log_tree(self, task, path, cutoff_time, walk, parent=None):
+        """Walk a log tree, journaling each directory's files and then its subtree.
+        
+        With a compression pool the directory's logs are only submitted here;
+        its records are written by collect_compressed once they finish.
+        """
+        if self.journal and self.journal.is_done(task, path):
+            return 0
+        files_done = bool(self.journal and self.journal.is_done(task, path, scope="files"))
+        
+        subdirs = []
+        old_logs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Excluded and protected directories are pruned with their whole subtree
+                        if self.policy.is_excluded(entry.path, entry.name):
+                            continue
+                        try:
+                            if entry.stat(follow_symlinks=False).st_dev != walk["device"]:
+                                self.log_action("mount_skipped", f"Kept logs on mounted filesystem: {entry.path}")
+                                continue
+                        except OSError:
+                            continue  # Vanished while scanning
+                        subdirs.append(entry.path)
+                    elif files_done:
+                        continue
+                    elif self.policy.match_log_name(entry.path, entry.name) and entry.is_file(follow_symlinks=False):
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                            if st.st_dev == walk["device"] and self.policy.match_log_stat(st, cutoff_time):
+                                old_logs.append((entry.path, st.st_size))
+                        except OSError as e:
+                            self.log_action("warning", f"Could not stat log {entry.path}: {str(e)}")
+        except OSError:
+            return 0  # Unreadable directories are skipped, as os.walk does
+        
+        node = {"parent": parent, "files_done": files_done, "futures": 0,
+                "children": 0, "walked": False, "bytes": 0}
+        walk["dirs"][path] = node
+        if parent is not None:
+            walk["dirs"][parent]["children"] += 1
+        
+        cleaned_size = 0
+        if old_logs and self.log_mode == "compress" and self.compress_pool:
+            codec = self.compression["codec"]
+            level = self.compression["level"]
+            for file_path, size in old_logs:
+                future = self.compress_pool.submit(compress_log_file, file_path, codec, level)
+                walk["futures"][future] = path
+            node["futures"] = len(old_logs)
+        elif old_logs:
+            node["bytes"] = cleaned_size = self.dispose_old_logs(old_logs)
+        
+        if not node["futures"]:
+            self.mark_log_files(task, path, node)
+        
+        for subdir in subdirs:
+            cleaned_size += self.clean_log_tree(task, subdir, cutoff_time, walk, parent=path)
+        
+        node["walked"] = True
+        self.settle_log_dir(task, path, walk)
+        return cleaned_size
+    
+    def mark_log_files(self, task, path, node):
+        """Journal that the logs directly in path are handled"""
+        if self.journal and not node["files_done"]:
+            self.journal.mark_done(task, path, node["bytes"], scope="files")
+    
+    def settle_log_dir(self, task, path, walk):
+        """Journal path's subtree once it and all its subdirectories are finished"""
+        while path is not None:
+            node = walk["dirs"][path]
+            if not node["walked"] or node["futures"] or node["children"]:
+                return
+            if self.journal:
+                self.journal.mark_done(task, path)
+            del walk["dirs"][path]
+            path = node["parent"]
+            if path is not None:
+                walk["dirs"][path]["children"] -= 1
+    
+    def collect_compressed(self, task, walk):
+        """Wait for a walk's compression jobs, journaling each directory as it finishes"""
+        cleaned_size = 0
+        for future in as_completed(walk["futures"]):
+            path = walk["futures"][future]
+            saved = self.record_compression(future.result())
+            cleaned_size += saved
+            node = walk["dirs"][path]
+            node["bytes"] += saved
+            node["futures"] -= 1
+            if not node["futures"]:
+                self.mark_log_files(task, path, node)
+                self.settle_log_dir(task, path, walk)
+        return cleaned_size
+    
+    def dispose_old_logs(self, old_logs):
+        """Delete or compress old logs in this process, returning bytes reclaimed"""
+        cleaned_size = 0
+        if self.log_mode != "compress":
+            for file_path, size in old_logs:
+                try:
+                    os.remove(file_path)
+                    cleaned_size += size
+                    self.log_action("log_deleted", f"Removed old log: {file_path}")
+                except Exception as e:
+                    self.log_action("warning", f"Could not delete log {file_path}: {str(e)}")
+            return cleaned_size
+        
+        codec = self.compression["codec"]
+        level = self.compression["level"]
+        for file_path, size in old_logs:
+            cleaned_size += self.record_compression(compress_log_file(file_path, codec, level))
+        return cleaned_size
+    
+    def record_compression(self, result):
+        """Log one compress_log_file result, returning bytes saved"""
+        if result["status"] == "compressed":
+            with self.log_lock:
+                self.compression["files"] += 1
+                self.compression["bytes_before"] += result["bytes_before"]
+                self.compression["bytes_after"] += result["bytes_after"]
+            self.log_action("log_compressed", 
+                          f"Compressed {result['path']}: {self.format_bytes(result['bytes_before'])} -> "
+                          f"{self.format_bytes(result['bytes_after'])}")
+            return result["bytes_before"] - result["bytes_after"]
+        if result["status"] == "skipped":
+            with self.log_lock:
+                self.compression["skipped"] += 1
+            self.log_action("log_skipped", f"Skipped {result['path']}: {result['error']}")
+        else:
+            self.log_action("warning", f"Could not compress log {result['path']}: {result['error']}")
+        return 0
+    
+    def configure_log_mode(self, params):
+        """Set up delete or compress handling of old logs"""
+        self.log_mode = params.get('log_mode', 'delete')
+        if self.log_mode == "delete":
+            return
+        if self.log_mode != "compress":
+            raise ValueError(f"Unsupported log_mode: {self.log_mode}")
+        
+        codec = params.get('compression', 'gzip')
+        if codec not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {codec}")
+        if codec == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise Exception("zstd compression requires the zstandard package")
+        self.compression = {
+            "codec": codec,
+            "level": params.get('compression_level'),
+            "files": 0,
+            "skipped": 0,
+            "bytes_before": 0,
+            "bytes_after": 0
+        }
+    
     def clean_temp_files(self):
         """Clean temporary files"""
         cleaned_size = 0
         
         try:
-            # Clean system temp directory
-            temp_dir = tempfile.gettempdir()
-            if os.path.exists(temp_dir):
-                for item in os.listdir(temp_dir):
-                    item_path = os.path.join(temp_dir, item)
-                    try:
-                        if os.path.isfile(item_path):
-                            size = os.path.getsize(item_path)
-                            os.remove(item_path)
-                            cleaned_size += size
-                            self.log_action("file_deleted", f"Removed temp file: {item}")
-                        elif os.path.isdir(item_path):
-                            shutil.rmtree(item_path)
-                            self.log_action("directory_deleted", f"Removed temp directory: {item}")
-                    except Exception as e:
-                        self.log_action("warning", f"Could not delete {item_path}: {str(e)}")
-            
-            # Clean user temp directories on Windows
-            if self.system == "windows":
-                import getpass
-                user_temp = os.path.join(os.environ.get('TEMP', 'C:\\Windows\\Temp'))
-                if os.path.exists(user_temp):
-                    for item in os.listdir(user_temp):
-                        try:
-                            item_path = os.path.join(user_temp, item)
-                            if os.path.isfile(item_path):
-                                size = os.path.getsize(item_path)
-                                os.remove(item_path)
-                                cleaned_size += size
-                        except Exception as e:
-                            self.log_action("warning", f"Could not delete user temp file: {str(e)}")
-                            
+            for temp_dir in self.get_temp_paths():
+                cleaned_size += self.clean_temp_dir(temp_dir)
         except Exception as e:
             self.log_action("error", f"Temp file cleanup failed: {str(e)}")
             
@@ -103,77 +797,63 @@ class DiskCleanup:
         cleaned_size = 0
         
         try:
-            home = os.path.expanduser("~")
-            
-            # Common browser cache paths
-            cache_paths = [
-                os.path.join(home, "AppData", "Local", "Google", "Chrome", "User Data", "Default", "Cache"),
-                os.path.join(home, "AppData", "Local", "Microsoft", "Edge", "User Data", "Default", "Cache"),
-                os.path.join(home, ".cache", "mozilla", "firefox"),
-                os.path.join(home, ".cache", "google-chrome")
-            ]
-            
-            for cache_path in cache_paths:
-                if os.path.exists(cache_path):
-                    try:
-                        size_before = sum(os.path.getsize(os.path.join(dirpath, filename)) 
-                                       for dirpath, dirnames, filenames in os.walk(cache_path) 
-                                       for filename in filenames)
-                        
-                        shutil.rmtree(cache_path)
-                        cleaned_size += size_before
-                        self.log_action("cache_cleaned", f"Cleaned browser cache: {cache_path}")
-                    except Exception as e:
-                        self.log_action("warning", f"Could not clean cache {cache_path}: {str(e)}")
-                        
+            for cache_path in self.get_cache_paths():
+                cleaned_size += self.clean_cache_dir(cache_path)
         except Exception as e:
             self.log_action("error", f"Browser cache cleanup failed: {str(e)}")
             
         return cleaned_size
     
-    def clean_log_files(self, days_old=7):
+    def clean_log_files(self, days_old=None):
         """Clean old log files"""
         cleaned_size = 0
         
         try:
-            current_time = time.time()
-            cutoff_time = current_time - (days_old * 24 * 60 * 60)
-            
-            log_paths = []
-            
-            if self.system == "windows":
-                log_paths.extend([
-                    "C:\\Windows\\Logs",
-                    "C:\\Windows\\debug",
-                    "C:\\ProgramData\\Microsoft\\Windows\\WER\\ReportArchive"
-                ])
-            else:
-                log_paths.extend([
-                    "/var/log",
-                    os.path.expanduser("~/.local/share/logs")
-                ])
-            
-            for log_path in log_paths:
-                if os.path.exists(log_path):
-                    for root, dirs, files in os.walk(log_path):
-                        for file in files:
-                            if file.endswith(('.log', '.out', '.err')):
-                                file_path = os.path.join(root, file)
-                                try:
-                                    file_time = os.path.getmtime(file_path)
-                                    if file_time < cutoff_time:
-                                        size = os.path.getsize(file_path)
-                                        os.remove(file_path)
-                                        cleaned_size += size
-                                        self.log_action("log_deleted", f"Removed old log: {file_path}")
-                                except Exception as e:
-                                    self.log_action("warning", f"Could not delete log {file_path}: {str(e)}")
-                                    
+            cutoff_time = self.policy.cutoff_time() if days_old is None else time.time() - (days_old * 24 * 60 * 60)
+            for log_path in self.get_log_paths():
+                cleaned_size += self.clean_log_dir(log_path, cutoff_time)
         except Exception as e:
             self.log_action("error", f"Log file cleanup failed: {str(e)}")
             
         return cleaned_size
     
+    def plan_cleanup(self, params):
+        """Map every enabled cleanup root to the mount it lives on"""
+        targets = []
+        if params.get('clear_temp', True):
+            targets.extend(("temp", path) for path in self.get_temp_paths())
+        if params.get('clear_cache', True):
+            targets.extend(("cache", path) for path in self.get_cache_paths())
+        if params.get('clear_logs', True):
+            targets.extend(("logs", path) for path in self.get_log_paths())
+        
+        plan = {}
+        for kind, path in targets:
+            if not os.path.exists(path):
+                continue
+            mount = self.find_mount(path)
+            entry = plan.setdefault(mount["mount_point"], {"mount": mount, "tasks": []})
+            entry["tasks"].append((kind, path))
+        return plan
+    
+    def run_task(self, kind, path, cutoff_time):
+        """Run one cleanup task, returning the bytes freed"""
+        try:
+            if kind == "temp":
+                return self.clean_temp_dir(path)
+            if kind == "cache":
+                return self.clean_cache_dir(path)
+            if kind == "logs":
+                return self.clean_log_dir(path, cutoff_time)
+        except Exception as e:
+            self.log_action("error", f"Cleanup of {path} failed: {str(e)}")
+        return 0
+    
+    def run_device_tasks(self, tasks, cutoff_time):
+        """Run the tasks for one physical device sequentially"""
+        return [(mount_point, self.run_task(kind, path, cutoff_time))
+                for mount_point, kind, path in tasks]
+    
     def empty_recycle_bin(self):
         """Empty recycle bin (Windows only)"""
         if self.system != "windows":
@@ -196,11 +876,64 @@ class DiskCleanup:
             bytes_value /= 1024.0
         return f"{bytes_value:.2f} PB"
     
+    def journal_settings(self, params):
+        """Rules that decide what a journaled directory already had done to it"""
+        return {
+            "clear_temp": params.get('clear_temp', True),
+            "clear_cache": params.get('clear_cache', True),
+            "clear_logs": params.get('clear_logs', True),
+            "log_mode": self.log_mode,
+            "compression": self.compression and {"codec": self.compression["codec"],
+                                                 "level": self.compression["level"]},
+            "policy": self.policy.settings
+        }
+    
+    def open_journal(self, params):
+        """Open (or resume) the checkpoint journal for this ticket"""
+        ticket_id = params.get('ticket_id')
+        if not ticket_id or not params.get('checkpoint', True):
+            return None
+        
+        checkpoint_dir = params.get('checkpoint_dir') or os.path.join(
+            os.path.expanduser("~"), ".local", "state", "ai-service-desk")
+        try:
+            journal = CheckpointJournal(journal_path(checkpoint_dir, ticket_id),
+                                        settings=self.journal_settings(params),
+                                        flush_interval=params.get('checkpoint_interval', 1.0))
+        except (OSError, ValueError, KeyError) as e:
+            self.log_action("warning", f"Checkpoint journal unavailable, continuing without resume: {str(e)}")
+            return None
+        if journal.settings_changed:
+            self.log_action("checkpoint_reset", 
+                          f"Cleanup settings changed since the last run for ticket {ticket_id}; starting over")
+        if journal.resumed:
+            self.log_action("cleanup_resumed", 
+                          f"Resuming ticket {ticket_id}: {len(journal.completed)} directories done, "
+                          f"{self.format_bytes(sum(journal.prior_bytes.values()))} already cleaned")
+        return journal
+    
+    def merge_prior_bytes(self, mounts):
+        """Credit bytes freed by earlier runs of this ticket to their mounts"""
+        if not self.journal:
+            return 0
+        reports = {report["mount_point"]: report for report in mounts}
+        total = 0
+        for task, cleaned in self.journal.prior_bytes.items():
+            kind, path = task.split(":", 1)
+            # The root may be gone (e.g. a removed cache dir); its mount still resolves
+            report = reports.get(self.find_mount(path)["mount_point"])
+            if report is not None:
+                report["cleaned_bytes"] += cleaned
+            total += cleaned
+        return total
+    
     def run_cleanup(self, parameters):
         """Main cleanup function"""
+        completed = False
         try:
             params = json.loads(parameters) if isinstance(parameters, str) else parameters
             min_free_space_gb = params.get('min_free_space_gb', 5)
+            self.policy = CleanupPolicy.from_params(params)
             
             self.log_action("cleanup_started", f"Starting disk cleanup (min free space: {min_free_space_gb}GB)")
             
@@ -209,43 +942,93 @@ class DiskCleanup:
             if not initial_usage:
                 raise Exception("Could not get disk usage information")
             
-            self.log_action("disk_usage_initial", 
-                          f"Total: {self.format_bytes(initial_usage['total'])}, "
-                          f"Used: {self.format_bytes(initial_usage['used'])}, "
-                          f"Free: {self.format_bytes(initial_usage['free'])} "
-                          f"({initial_usage['percent_used']:.1f}%)")
+            self.configure_log_mode(params)
+            self.journal = self.open_journal(params)
+            
+            # Check which mounts holding cleanup targets are under pressure
+            plan = self.plan_cleanup(params)
+            mounts = []
+            pressured = []
+            for mount_point, entry in plan.items():
+                usage = self.get_disk_usage(mount_point)
+                if not usage:
+                    continue
+                free_gb = usage['free'] / (1024**3)
+                report = {
+                    "mount_point": mount_point,
+                    "device": entry["mount"]["source"],
+                    "fstype": entry["mount"]["fstype"],
+                    "physical_device": physical_device(entry["mount"]["device_id"],
+                                                       entry["mount"]["source"]),
+                    "paths": [path for kind, path in entry["tasks"]],
+                    "under_pressure": free_gb < min_free_space_gb,
+                    "before": usage,
+                    "after": usage,
+                    "cleaned_bytes": 0
+                }
+                mounts.append(report)
+                self.log_action("disk_usage_initial", 
+                              f"{mount_point}: Total: {self.format_bytes(usage['total'])}, "
+                              f"Used: {self.format_bytes(usage['used'])}, "
+                              f"Free: {self.format_bytes(usage['free'])} "
+                              f"({usage['percent_used']:.1f}%)")
+                if report["under_pressure"]:
+                    pressured.append(report)
+            
+            # Merge what earlier runs for this ticket already freed
+            total_cleaned = self.merge_prior_bytes(mounts)
             
-            # Check if cleanup is needed
-            free_gb = initial_usage['free'] / (1024**3)
-            if free_gb >= min_free_space_gb:
-                self.log_action("cleanup_skipped", f"Sufficient free space ({free_gb:.1f}GB >= {min_free_space_gb}GB)")
-                return self.generate_result(initial_usage, 0)
+            if not pressured:
+                self.log_action("cleanup_skipped", f"Sufficient free space on all mounts (>= {min_free_space_gb}GB)")
+                completed = True
+                return self.generate_result(initial_usage, total_cleaned, mounts)
+            
+            # One worker per physical device so no two workers contend for a disk;
+            # mounts spanning several disks (LVM, RAID) share a worker with any of them
+            by_device = {
+                device: [(report["mount_point"], kind, path)
+                         for report in members
+                         for kind, path in plan[report["mount_point"]]["tasks"]]
+                for device, members in group_by_disks(pressured).items()
+            }
             
-            # Perform cleanup operations
-            total_cleaned = 0
+            self.log_action("cleanup_plan", 
+                          f"Cleaning {len(pressured)} mount(s) on {len(by_device)} device(s): "
+                          f"{', '.join(r['mount_point'] for r in pressured)}")
             
-            # Clean temporary files
-            temp_cleaned = self.clean_temp_files()
-            total_cleaned += temp_cleaned
+            cutoff_time = self.policy.cutoff_time()
+            reports = {report["mount_point"]: report for report in pressured}
             
-            # Clean browser cache
-            cache_cleaned = self.clean_browser_cache()
-            total_cleaned += cache_cleaned
+            # Compression is CPU bound, so it gets one process per core
+            if self.log_mode == "compress" and params.get('clear_logs', True):
+                # Workers start on first submit from a device thread; forking a
+                # threaded process can deadlock, so never use the fork method
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self.compress_pool = ProcessPoolExecutor(
+                    max_workers=params.get('compression_workers') or os.cpu_count() or 1,
+                    mp_context=multiprocessing.get_context(start_method))
             
-            # Clean old log files
-            log_cleaned = self.clean_log_files()
-            total_cleaned += log_cleaned
+            with ThreadPoolExecutor(max_workers=len(by_device)) as executor:
+                futures = [executor.submit(self.run_device_tasks, tasks, cutoff_time)
+                           for tasks in by_device.values()]
+                for future in futures:
+                    for mount_point, cleaned in future.result():
+                        reports[mount_point]["cleaned_bytes"] += cleaned
+                        total_cleaned += cleaned
             
             # Empty recycle bin (Windows)
             recycle_cleaned = self.empty_recycle_bin()
             
             # Get final disk usage
-            final_usage = self.get_disk_usage()
+            for report in pressured:
+                report["after"] = self.get_disk_usage(report["mount_point"]) or report["before"]
+            final_usage = self.get_disk_usage() or initial_usage
             
             self.log_action("cleanup_completed", 
                           f"Cleaned {self.format_bytes(total_cleaned)} total")
             
-            return self.generate_result(final_usage, total_cleaned)
+            completed = True
+            return self.generate_result(final_usage, total_cleaned, mounts)
             
         except Exception as e:
             self.log_action("cleanup_failed", f"Cleanup failed: {str(e)}")
@@ -254,8 +1037,15 @@ class DiskCleanup:
                 "error": str(e),
                 "actions": self.cleanup_results
             }
+        finally:
+            if self.compress_pool:
+                self.compress_pool.shutdown()
+                self.compress_pool = None
+            if self.journal:
+                self.journal.close(complete=completed)
+                self.journal = None
     
-    def generate_result(self, disk_usage, cleaned_bytes):
+    def generate_result(self, disk_usage, cleaned_bytes, mounts=None):
         """Generate cleanup result"""
         return {
             "success": True,
@@ -263,6 +1053,10 @@ class DiskCleanup:
             "cleaned_bytes": cleaned_bytes,
             "cleaned_human": self.format_bytes(cleaned_bytes),
             "free_space_gb": disk_usage['free'] / (1024**3),
+            "mounts": mounts or [],
+            "resumed": bool(self.journal and self.journal.resumed),
+            "log_mode": self.log_mode,
+            "compression": self.compression,
             "actions": self.cleanup_results,
             "timestamp": datetime.now().isoformat()
         }
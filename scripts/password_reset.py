@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+Password Reset Automation Script
+Resets passwords for one or many users against a pluggable directory backend
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import queue
+import secrets
+import string
+import threading
+import http.client
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def generate_password(length=16):
+    """Generate a random password with mixed character classes"""
+    alphabet = string.ascii_letters + string.digits + "!@#$%^&*-_"
+    while True:
+        password = ''.join(secrets.choice(alphabet) for _ in range(length))
+        if (any(c.islower() for c in password) and any(c.isupper() for c in password)
+                and any(c.isdigit() for c in password)):
+            return password
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting resets per second"""
+
+    def __init__(self, rate_per_second, burst=None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(burst or max(1, rate_per_second))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        """Block until `count` tokens are available"""
+        if self.rate <= 0:
+            return
+        count = min(float(count), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ConnectionPool:
+    """Fixed-size pool of directory connections, opened lazily"""
+
+    def __init__(self, backend, size):
+        self.backend = backend
+        self.size = max(1, int(size))
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self.backend.connect()
+            except Exception:
+                with self.lock:
+                    self.created -= 1
+                raise
+        return self.idle.get()
+
+    def release(self, conn, broken=False):
+        if broken:
+            try:
+                self.backend.close(conn)
+            finally:
+                with self.lock:
+                    self.created -= 1
+            return
+        self.idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                self.backend.close(conn)
+            except Exception:
+                pass
+        with self.lock:
+            self.created = 0
+
+
+class DirectoryBackend:
+    """Base class for directory backends.
+
+    A backend opens connections and applies a batch of reset requests over a
+    single connection, returning one result dict per request in order. Each
+    result carries ``notified`` only when the backend actually told the user.
+    """
+
+    name = "base"
+    # Stand-in backends that change nothing real and label their results
+    dry_run = False
+    # Whether the backend can issue self-service reset links
+    issues_reset_links = False
+    # Whether the backend notifies users itself
+    notifies_users = False
+
+    def connect(self):
+        raise NotImplementedError
+
+    def close(self, conn):
+        pass
+
+    def reset_batch(self, conn, requests):
+        raise NotImplementedError
+
+
+class LocalDirectoryBackend(DirectoryBackend):
+    """In-process directory used for tests and dry runs.
+
+    Nothing leaves the process: "notifications" are only recorded in
+    ``self.notifications`` and every result is marked ``dry_run``.
+    """
+
+    name = "local"
+    dry_run = True
+    issues_reset_links = True
+    notifies_users = True
+
+    def __init__(self, users=None, latency=0.0):
+        # None means every well-formed user exists
+        self.users = None if users is None else {u.lower(): {} for u in users}
+        self.latency = float(latency)
+        self.lock = threading.Lock()
+        self.resets = {}
+        self.notifications = []
+        self.connections_opened = 0
+
+    def connect(self):
+        with self.lock:
+            self.connections_opened += 1
+            return {"id": self.connections_opened}
+
+    def reset_batch(self, conn, requests):
+        if self.latency:
+            time.sleep(self.latency)  # One round trip per batch
+        results = []
+        with self.lock:
+            for request in requests:
+                user = request["user"]
+                if self.users is not None and user.lower() not in self.users:
+                    results.append({"user": user, "status": "not_found",
+                                    "message": "User not found in directory"})
+                    continue
+                token = secrets.token_urlsafe(32) if request["reset_type"] == "self_service" else None
+                self.resets[user.lower()] = {
+                    "reset_type": request["reset_type"],
+                    "force_change": request["force_change"],
+                    "password": request.get("password"),
+                    "token": token,
+                    "timestamp": datetime.now().isoformat()
+                }
+                notified = request["notify_user"]
+                if notified:
+                    self.notifications.append({"user": user, "token": token,
+                                               "password": request.get("password")})
+                results.append({"user": user, "status": "success", "notified": notified,
+                                "dry_run": True,
+                                "message": f"Dry run, nothing sent: {describe_reset(request, notified)}"})
+        return results
+
+
+class LDAPDirectoryBackend(DirectoryBackend):
+    """LDAP backend (requires the ldap3 package)"""
+
+    name = "ldap"
+
+    def __init__(self, server_url, bind_dn, bind_password, base_dn,
+                 user_attribute="mail", password_attribute="userPassword", use_ssl=True):
+        self.server_url = server_url
+        self.bind_dn = bind_dn
+        self.bind_password = bind_password
+        self.base_dn = base_dn
+        self.user_attribute = user_attribute
+        self.password_attribute = password_attribute
+        self.use_ssl = use_ssl
+
+    def connect(self):
+        import ldap3
+        server = ldap3.Server(self.server_url, use_ssl=self.use_ssl, get_info=ldap3.NONE)
+        return ldap3.Connection(server, user=self.bind_dn, password=self.bind_password,
+                                auto_bind=True, raise_exceptions=False)
+
+    def close(self, conn):
+        conn.unbind()
+
+    def _escape(self, value):
+        from ldap3.utils.conv import escape_filter_chars
+        return escape_filter_chars(value)
+
+    def reset_batch(self, conn, requests):
+        import ldap3
+
+        # Resolve every DN in the batch with one search
+        lookup = {r["user"].lower(): r for r in requests}
+        search_filter = "(|%s)" % ''.join(
+            f"({self.user_attribute}={self._escape(r['user'])})" for r in requests)
+        conn.search(self.base_dn, search_filter, attributes=[self.user_attribute])
+        # With raise_exceptions=False a failed search just leaves no entries;
+        # raise so the batch is retried instead of reported as not_found
+        search_result = conn.result or {}
+        if search_result.get("result", 0) != 0:
+            raise Exception(f"LDAP search failed: {search_result.get('description', 'unknown error')} "
+                            f"{search_result.get('message', '')}".strip())
+        dns = {}
+        for entry in conn.entries:
+            value = str(entry[self.user_attribute].value).lower()
+            if value in lookup:
+                dns[value] = entry.entry_dn
+
+        results = []
+        for request in requests:
+            user = request["user"]
+            dn = dns.get(user.lower())
+            if not dn:
+                results.append({"user": user, "status": "not_found",
+                                "message": "User not found in directory"})
+                continue
+            changes = {self.password_attribute: [(ldap3.MODIFY_REPLACE, [request["password"]])]}
+            if request["force_change"]:
+                changes["pwdReset"] = [(ldap3.MODIFY_REPLACE, ["TRUE"])]
+            if conn.modify(dn, changes):
+                results.append({"user": user, "status": "success", "notified": False,
+                                "message": describe_reset(request, False)})
+            else:
+                results.append({"user": user, "status": "failed",
+                                "message": conn.result.get("description", "LDAP modify failed")})
+        return results
+
+
+class HTTPIdPBackend(DirectoryBackend):
+    """HTTP identity provider exposing a bulk password reset endpoint"""
+
+    name = "http"
+    issues_reset_links = True
+    notifies_users = True
+
+    def __init__(self, base_url, api_token=None, endpoint="/users/password-resets", timeout=30):
+        parsed = urlparse(base_url)
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.netloc
+        self.path = parsed.path.rstrip('/') + endpoint
+        self.api_token = api_token
+        self.timeout = timeout
+
+    def connect(self):
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def close(self, conn):
+        conn.close()
+
+    def reset_batch(self, conn, requests):
+        body = json.dumps({"resets": [
+            {
+                "user": r["user"],
+                "reset_type": r["reset_type"],
+                "force_change": r["force_change"],
+                "notify_user": r["notify_user"],
+                # The IdP issues its own reset links for self-service resets
+                "password": r.get("password")
+            } for r in requests
+        ]})
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.api_token:
+            headers["Authorization"] = f"Bearer {self.api_token}"
+        conn.request("POST", self.path, body=body, headers=headers)
+        response = conn.getresponse()
+        payload = response.read()
+        if response.status >= 400:
+            raise Exception(f"IdP returned HTTP {response.status}: {payload[:200]!r}")
+
+        returned = {str(item.get("user", "")).lower(): item
+                    for item in json.loads(payload).get("results", [])}
+        results = []
+        for request in requests:
+            user = request["user"]
+            item = returned.get(user.lower())
+            if item is None:
+                results.append({"user": user, "status": "failed",
+                                "message": "No result returned by IdP"})
+            else:
+                # Only trust a notification the IdP confirms it sent
+                notified = bool(item.get("notified", False))
+                results.append({"user": user, "status": item.get("status", "failed"),
+                                "notified": notified,
+                                "message": item.get("message", describe_reset(request, notified))})
+        return results
+
+
+def describe_reset(request, notified):
+    """Human readable summary of a completed reset"""
+    if request["reset_type"] == "self_service":
+        message = "Password reset link issued"
+    else:
+        message = "Temporary password set"
+    if request["force_change"]:
+        message += ", change required at next login"
+    if notified:
+        message += ", user notified"
+    return message
+
+
+class WebhookDelivery:
+    """Delivers temporary passwords to a notification service over HTTPS.
+
+    The service receives ``{"user", "reset_type", "password", "force_change"}``
+    and is responsible for getting the credential to the user (email, SMS, ...).
+    """
+
+    name = "webhook"
+
+    def __init__(self, url, api_token=None, timeout=30):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("https", "http") or not parsed.netloc:
+            raise ValueError(f"Invalid delivery URL: {url}")
+        self.url = url
+        self.api_token = api_token
+        self.timeout = timeout
+
+    def deliver(self, request):
+        parsed = urlparse(self.url)
+        conn_class = http.client.HTTPConnection if parsed.scheme == "http" else http.client.HTTPSConnection
+        conn = conn_class(parsed.netloc, timeout=self.timeout)
+        try:
+            headers = {"Content-Type": "application/json"}
+            if self.api_token:
+                headers["Authorization"] = f"Bearer {self.api_token}"
+            body = json.dumps({
+                "user": request["user"],
+                "reset_type": request["reset_type"],
+                "password": request.get("password"),
+                "force_change": request["force_change"]
+            })
+            conn.request("POST", parsed.path or "/", body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                raise Exception(f"Delivery service returned HTTP {response.status}")
+        finally:
+            conn.close()
+
+
+def create_delivery(params):
+    """Build the credential delivery hook, or None when none is configured"""
+    config = params.get('delivery') or {}
+    url = config.get('url', os.environ.get('PASSWORD_RESET_DELIVERY_URL'))
+    if not url:
+        return None
+    return WebhookDelivery(url, api_token=os.environ.get('PASSWORD_RESET_DELIVERY_TOKEN', config.get('api_token')),
+                           timeout=config.get('timeout', 30))
+
+
+def batch_failed(batch, error):
+    """Per-user failure entries for a batch that could not be applied"""
+    return [{"user": r["user"], "status": "failed", "message": str(error)} for r in batch]
+
+
+def create_backend(params):
+    """Build the directory backend described by the parameters.
+
+    The in-process ``local`` backend is only used for an explicit dry run.
+    """
+    backend_type = params.get('backend') or os.environ.get('PASSWORD_RESET_BACKEND')
+    config = params.get('backend_config', {})
+
+    if params.get('dry_run'):
+        return LocalDirectoryBackend(users=config.get('users'), latency=config.get('latency', 0.0))
+    if not backend_type:
+        raise ValueError("No directory backend configured; set backend or PASSWORD_RESET_BACKEND")
+    if backend_type == "local":
+        raise ValueError("The local backend only simulates resets; pass dry_run to use it")
+    if backend_type == "ldap":
+        return LDAPDirectoryBackend(
+            server_url=config.get('server_url', os.environ.get('LDAP_URL')),
+            bind_dn=config.get('bind_dn', os.environ.get('LDAP_BIND_DN')),
+            bind_password=os.environ.get('LDAP_BIND_PASSWORD', config.get('bind_password')),
+            base_dn=config.get('base_dn', os.environ.get('LDAP_BASE_DN')),
+            user_attribute=config.get('user_attribute', 'mail'),
+            password_attribute=config.get('password_attribute', 'userPassword'),
+            use_ssl=config.get('use_ssl', True)
+        )
+    if backend_type == "http":
+        return HTTPIdPBackend(
+            base_url=config.get('base_url', os.environ.get('IDP_BASE_URL')),
+            api_token=os.environ.get('IDP_API_TOKEN', config.get('api_token')),
+            endpoint=config.get('endpoint', '/users/password-resets'),
+            timeout=config.get('timeout', 30)
+        )
+    raise ValueError(f"Unknown directory backend: {backend_type}")
+
+
+class PasswordReset:
+    def __init__(self, backend=None, delivery=None):
+        self.backend = backend
+        self.delivery = delivery
+        self.actions = []
+        self.log_lock = threading.Lock()
+
+    def log_action(self, action, details):
+        """Log password reset actions"""
+        timestamp = datetime.now().isoformat()
+        log_entry = {
+            "timestamp": timestamp,
+            "action": action,
+            "details": details
+        }
+        with self.log_lock:
+            self.actions.append(log_entry)
+        print(f"[{timestamp}] {action}: {details}")
+
+    def collect_users(self, params):
+        """Gather, normalise and de-duplicate the users to reset"""
+        users = params.get('users') or []
+        users = [users] if isinstance(users, str) else list(users)
+        for key in ('user_email', 'email'):
+            if params.get(key):
+                users.append(params[key])
+
+        seen = set()
+        unique = []
+        for user in users:
+            user = str(user).strip()
+            if user and user.lower() not in seen:
+                seen.add(user.lower())
+                unique.append(user)
+        return unique
+
+    def build_request(self, user, reset_type, force_change, notify_user):
+        request = {
+            "user": user,
+            "reset_type": reset_type,
+            "force_change": force_change,
+            "notify_user": notify_user
+        }
+        if reset_type == "temporary_password":
+            request["password"] = generate_password()
+        return request
+
+    def check_delivery(self, reset_type, notify_user):
+        """Refuse resets whose outcome could never reach the user"""
+        if reset_type == "self_service" and not self.backend.issues_reset_links:
+            raise ValueError(f"The {self.backend.name} backend cannot issue reset links; "
+                             f"use reset_type 'temporary_password' with a delivery hook")
+        if reset_type == "temporary_password" and self.delivery is None and not (
+                notify_user and self.backend.notifies_users):
+            raise ValueError("Temporary passwords need a delivery hook or a backend that notifies users")
+        if notify_user and self.delivery is None and not self.backend.notifies_users:
+            raise ValueError(f"The {self.backend.name} backend cannot notify users; configure a delivery hook")
+
+    def deliver_results(self, batch, results):
+        """Send temporary passwords the backend did not deliver through the delivery hook"""
+        if self.delivery is None:
+            return results
+        requests = {r["user"]: r for r in batch}
+        for item in results:
+            request = requests.get(item["user"])
+            if item["status"] != "success" or item.get("notified") or not request or not request.get("password"):
+                continue
+            try:
+                self.delivery.deliver(request)
+                item["notified"] = True
+                item["message"] = describe_reset(request, True)
+            except Exception as e:
+                item["status"] = "delivery_failed"
+                item["message"] = f"Password changed but delivery failed: {str(e)}"
+        return results
+
+    def process_batch(self, pool, limiter, batch, max_retries):
+        """Send one batch over a pooled connection, retrying on connection errors"""
+        limiter.acquire(len(batch))
+        last_error = None
+        for attempt in range(max_retries + 1):
+            conn = None
+            try:
+                conn = pool.acquire()
+                results = self.backend.reset_batch(conn, batch)
+            except Exception as e:
+                if conn is not None:
+                    pool.release(conn, broken=True)
+                last_error = e
+                self.log_action("warning", f"Batch of {len(batch)} failed (attempt {attempt + 1}): {str(e)}")
+                continue
+            pool.release(conn)
+            return self.deliver_results(batch, results)
+        return batch_failed(batch, last_error)
+
+    def reset_passwords(self, parameters):
+        """Main password reset function"""
+        pool = None
+        try:
+            params = json.loads(parameters) if isinstance(parameters, str) else parameters
+            reset_type = params.get('reset_type', 'self_service')
+            force_change = bool(params.get('force_change', False))
+            notify_user = bool(params.get('notify_user', True))
+            batch_size = max(1, int(params.get('batch_size', 50)))
+            pool_size = max(1, int(params.get('pool_size', 4)))
+            rate_limit = float(params.get('rate_limit_per_second', 200))
+            max_retries = int(params.get('max_retries', 2))
+
+            if reset_type not in ('self_service', 'temporary_password'):
+                raise ValueError(f"Unsupported reset_type: {reset_type}")
+
+            if self.backend is None:
+                self.backend = create_backend(params)
+            if self.delivery is None:
+                self.delivery = create_delivery(params)
+            self.check_delivery(reset_type, notify_user)
+
+            users = self.collect_users(params)
+            if not users:
+                raise ValueError("No users supplied for password reset")
+
+            start_time = time.monotonic()
+            self.log_action("reset_started",
+                            f"Resetting {len(users)} user(s) via {self.backend.name} backend "
+                            f"(batch size: {batch_size}, pool size: {pool_size})")
+
+            results = {}
+            valid = []
+            for user in users:
+                if EMAIL_PATTERN.match(user):
+                    valid.append(user)
+                else:
+                    results[user] = {"user": user, "status": "invalid",
+                                     "message": "Not a valid email address"}
+
+            requests = [self.build_request(u, reset_type, force_change, notify_user) for u in valid]
+            batches = [requests[i:i + batch_size] for i in range(0, len(requests), batch_size)]
+
+            pool = ConnectionPool(self.backend, pool_size)
+            limiter = RateLimiter(rate_limit, burst=max(batch_size, rate_limit))
+            with ThreadPoolExecutor(max_workers=min(pool_size, len(batches)) or 1) as executor:
+                futures = [(executor.submit(self.process_batch, pool, limiter, batch, max_retries), batch)
+                           for batch in batches]
+                for future, batch in futures:
+                    # One broken batch must not discard the results of the others
+                    try:
+                        batch_results = future.result()
+                    except Exception as e:
+                        batch_results = batch_failed(batch, e)
+                    for item in batch_results:
+                        results[item["user"]] = item
+
+            ordered = [results[u] for u in users]
+            summary = {}
+            for item in ordered:
+                summary[item["status"]] = summary.get(item["status"], 0) + 1
+                if item["status"] != "success":
+                    self.log_action("reset_failed", f"{item['user']}: {item['message']}")
+
+            elapsed = time.monotonic() - start_time
+            succeeded = summary.get("success", 0)
+            self.log_action("reset_completed",
+                            f"{succeeded}/{len(users)} password(s) reset in {elapsed:.2f}s")
+
+            return {
+                "success": succeeded == len(users),
+                "backend": self.backend.name,
+                "dry_run": self.backend.dry_run,
+                "reset_type": reset_type,
+                "total_users": len(users),
+                "summary": summary,
+                "results": ordered,
+                "execution_time": elapsed,
+                "actions": self.actions,
+                "timestamp": datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            self.log_action("reset_error", f"Password reset failed: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "actions": self.actions
+            }
+        finally:
+            if pool is not None:
+                pool.close_all()
+
+
+def main():
+    """Main function"""
+    try:
+        if len(sys.argv) < 2:
+            print("Error: Missing parameters")
+            sys.exit(1)
+
+        parameters = sys.argv[1]
+        resetter = PasswordReset()
+        result = resetter.reset_passwords(parameters)
+
+        print(json.dumps(result, indent=2))
+
+        if result.get("success", False):
+            sys.exit(0)
+        else:
+            sys.exit(1)
+
+    except Exception as e:
+        error_result = {
+            "success": False,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }
+        print(json.dumps(error_result, indent=2))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
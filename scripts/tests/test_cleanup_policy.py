@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for cleanup policy glob matching
+"""
+
+import os
+import re
+import sys
+import random
+import fnmatch
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from cleanup_policy import GlobIndex, CleanupPolicy, glob_to_regex, literal_tail
+
+NAME_ALPHABET = "abcz09.-_^!]"
+
+
+def random_glob(rng, allow_slash=False):
+    """A glob mixing literals, '*', '?' and [...] classes (including odd ones)"""
+    parts = []
+    for _ in range(rng.randint(1, 5)):
+        kind = rng.random()
+        if kind < 0.4:
+            parts.append(''.join(rng.choice("abcz09.-_") for _ in range(rng.randint(1, 6))))
+        elif kind < 0.6:
+            parts.append('*')
+        elif kind < 0.7:
+            parts.append('?')
+        elif kind < 0.9:
+            body = ''.join(rng.choice("abz09-^!]") for _ in range(rng.randint(1, 4)))
+            parts.append('[' + body + ']')
+        elif allow_slash:
+            parts.append(rng.choice(['/', '**/', '/logs/']))
+        else:
+            parts.append('[')
+    return ''.join(parts)
+
+
+def random_name(rng, patterns):
+    """A name that often matches one of the patterns"""
+    if rng.random() < 0.5:
+        pattern = rng.choice(patterns)
+        name = re.sub(r'\[[^\]]*\]', lambda m: rng.choice("abz09-^!"), pattern)
+        return ''.join(rng.choice("ab.") if c in '*?' else c for c in name)
+    return ''.join(rng.choice(NAME_ALPHABET) for _ in range(rng.randint(0, 12)))
+
+
+class GlobIndexTest(unittest.TestCase):
+    def test_basename_patterns_match_like_fnmatch(self):
+        rng = random.Random(20261019)
+        for _ in range(200):
+            patterns = [random_glob(rng) for _ in range(rng.randint(1, 40))]
+            index = GlobIndex(patterns)
+            for _ in range(50):
+                name = random_name(rng, patterns)
+                expected = any(fnmatch.fnmatchcase(name, p) for p in patterns)
+                self.assertEqual(index.match(name), expected, (patterns, name))
+
+    def test_path_patterns_match_each_pattern_regex(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            patterns = ['/' + random_glob(rng, allow_slash=True) for _ in range(rng.randint(1, 30))]
+            patterns += ['**/' + random_glob(rng, allow_slash=True) for _ in range(rng.randint(1, 10))]
+            index = GlobIndex(patterns, anchor_anywhere=True)
+            regexes = [re.compile(glob_to_regex(p), re.DOTALL) for p in patterns]
+            for _ in range(50):
+                value = '/' + random_name(rng, patterns).lstrip('/')
+                expected = any(r.fullmatch(value) for r in regexes)
+                self.assertEqual(index.match(value), expected, (patterns, value))
+
+    def test_odd_bracket_classes(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            index = GlobIndex(["log[9-0]*", "[^a]x", "[!a]y", "[a-]z", "[&&b]"])
+        self.assertFalse(index.match("log5"))
+        self.assertTrue(index.match("^x"))
+        self.assertFalse(index.match("bx"))
+        self.assertTrue(index.match("by"))
+        self.assertTrue(index.match("-z"))
+        self.assertTrue(index.match("&"))
+
+    def test_literal_tail_skips_bracket_contents(self):
+        self.assertEqual(literal_tail("app[*]x.log"), "x.log")
+        self.assertEqual(literal_tail("*.log"), ".log")
+
+
+class CleanupPolicyTest(unittest.TestCase):
+    def test_exclude_and_protected(self):
+        policy = CleanupPolicy(exclude=["*.keep", "**/archive"], protected_paths=["/srv/keep"])
+        self.assertTrue(policy.is_excluded("/tmp/sub/important.keep"))
+        self.assertTrue(policy.is_excluded("/var/log/app/archive"))
+        self.assertTrue(policy.is_excluded("/srv/keep/file"))
+        self.assertFalse(policy.is_excluded("/tmp/sub/junk"))
+
+    def test_log_rules(self):
+        policy = CleanupPolicy(include=["*.log", "/var/log/app*/*.trace"], exclude=["keep-*"])
+        self.assertTrue(policy.match_log_name("/var/log/x.log", "x.log"))
+        self.assertTrue(policy.match_log_name("/var/log/app1/y.trace", "y.trace"))
+        self.assertFalse(policy.match_log_name("/var/log/keep-1.log", "keep-1.log"))
+        self.assertFalse(policy.match_log_name("/var/log/x.txt", "x.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
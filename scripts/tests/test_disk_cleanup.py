@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Tests for disk cleanup, run against temporary directory trees
+"""
+
+import os
+import sys
+import gzip
+import lzma
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import disk_cleanup
+from disk_cleanup import (DiskCleanup, CheckpointJournal, journal_path, physical_device,
+                          group_by_disks, compress_log_file)
+from cleanup_policy import CleanupPolicy
+
+
+class CleanupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def write(self, relative, content="x" * 100, age_days=None):
+        path = self.path(relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        if age_days is not None:
+            old = os.path.getmtime(path) - age_days * 24 * 60 * 60
+            os.utime(path, (old, old))
+        return path
+
+    def params(self, **params):
+        params.setdefault('min_free_space_gb', 10 ** 6)
+        params.setdefault('checkpoint', False)
+        policy = params.setdefault('policy', {})
+        for key in ('temp_paths', 'cache_paths', 'log_paths'):
+            policy.setdefault(key, [])
+        return params
+
+    def run_cleanup(self, **params):
+        with mock.patch('sys.stdout'):
+            return DiskCleanup().run_cleanup(self.params(**params))
+
+
+class PhysicalDeviceTest(CleanupTestCase):
+    def make_sysfs(self):
+        """Fake /sys with sda2 and sdb1 partitions under an LVM volume dm-0"""
+        devices = self.path("sys", "devices")
+        for disk, part in (("sda", "sda2"), ("sdb", "sdb1")):
+            os.makedirs(os.path.join(devices, disk, part))
+            open(os.path.join(devices, disk, part, "partition"), 'w').close()
+        os.makedirs(os.path.join(devices, "dm-0", "slaves"))
+        os.symlink("../../sda/sda2", os.path.join(devices, "dm-0", "slaves", "sda2"))
+        os.symlink("../../sdb/sdb1", os.path.join(devices, "dm-0", "slaves", "sdb1"))
+        block = self.path("sys", "dev", "block")
+        os.makedirs(block)
+        os.symlink("../../devices/dm-0", os.path.join(block, "253:0"))
+        os.symlink("../../devices/sda/sda2", os.path.join(block, "8:2"))
+        patcher = mock.patch.object(disk_cleanup, 'SYS_DEV_BLOCK_PATH', block)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_partitions_and_volumes_resolve_to_disks(self):
+        self.make_sysfs()
+        self.assertEqual(physical_device("8:2"), "sda")
+        self.assertEqual(physical_device("253:0"), "sda,sdb")
+
+    def test_anonymous_device_falls_back_to_source(self):
+        self.make_sysfs()
+        with mock.patch.object(disk_cleanup, 'block_device_id', return_value="8:2"):
+            self.assertEqual(physical_device("0:45", "/dev/sda2"), "sda")
+        self.assertEqual(physical_device("0:46", "tmpfs"), "0:46")
+
+    def test_mounts_sharing_a_disk_share_a_worker(self):
+        groups = group_by_disks([
+            {"mount_point": "/", "physical_device": "sda"},
+            {"mount_point": "/data", "physical_device": "sdb,sdc"},
+            {"mount_point": "/home", "physical_device": "sda,sdd"},
+            {"mount_point": "/srv", "physical_device": "sdc"},
+        ])
+        self.assertEqual(sorted(groups), ["sda,sdd", "sdb,sdc"])
+        self.assertEqual(sorted(r["mount_point"] for r in groups["sda,sdd"]), ["/", "/home"])
+
+
+class TreeRemovalTest(CleanupTestCase):
+    def remove_tree(self, relative, device=None):
+        path = self.path(relative)
+        cleanup = DiskCleanup()
+        with mock.patch('sys.stdout'):
+            return cleanup.remove_tree(path, os.stat(path).st_dev if device is None else device)
+
+    def test_whole_tree_is_removed(self):
+        self.write("tmp/sub/a", "x" * 10)
+        self.write("tmp/sub/deep/b", "y" * 5)
+        self.assertEqual(self.remove_tree("tmp/sub"), (15, True))
+        self.assertFalse(os.path.exists(self.path("tmp", "sub")))
+
+    def test_directories_on_other_devices_are_kept(self):
+        # Every subdirectory looks like a nested mount when the root device differs
+        self.write("tmp/sub/junk")
+        self.write("tmp/sub/mnt/data")
+        root_device = os.stat(self.path("tmp", "sub")).st_dev
+        cleaned, complete = self.remove_tree("tmp/sub", device=root_device + 1)
+        self.assertFalse(complete)
+        self.assertFalse(os.path.exists(self.path("tmp", "sub", "junk")))
+        self.assertTrue(os.path.exists(self.path("tmp", "sub", "mnt", "data")))
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "symlinks not supported")
+    def test_symlinks_are_not_followed(self):
+        outside = self.write("outside/keep")
+        os.makedirs(self.path("tmp", "sub"))
+        os.symlink(os.path.dirname(outside), self.path("tmp", "sub", "link"))
+        self.remove_tree("tmp/sub")
+        self.assertTrue(os.path.exists(outside))
+
+
+class PolicyTest(CleanupTestCase):
+    def test_excluded_files_survive_temp_and_cache_cleanup(self):
+        for relative in ("tmp/sub/important.keep", "tmp/sub/junk", "tmp/sub/deep/x", "tmp/plain",
+                         "tmp/prot/p", "cache/c/a.keep", "cache/c/b"):
+            self.write(relative)
+        result = self.run_cleanup(clear_logs=False, policy={
+            "exclude": ["*.keep"], "protected_paths": [self.path("tmp", "prot", "p")],
+            "temp_paths": [self.path("tmp")], "cache_paths": [self.path("cache")]})
+        self.assertTrue(result["success"])
+        remaining = sorted(os.path.relpath(os.path.join(d, f), self.root)
+                           for d, _, files in os.walk(self.root) for f in files)
+        self.assertEqual(remaining, sorted(os.path.join(*p.split("/")) for p in
+                                           ("cache/c/a.keep", "tmp/prot/p", "tmp/sub/important.keep")))
+
+    def test_excluded_log_directories_are_pruned(self):
+        self.write("logs/app.log", age_days=30)
+        self.write("logs/archive/old.log", age_days=30)
+        result = self.run_cleanup(clear_temp=False, clear_cache=False, policy={
+            "exclude": ["**/archive"], "log_paths": [self.path("logs")]})
+        self.assertTrue(result["success"])
+        self.assertFalse(os.path.exists(self.path("logs", "app.log")))
+        self.assertTrue(os.path.exists(self.path("logs", "archive", "old.log")))
+
+
+class CheckpointTest(CleanupTestCase):
+    def setUp(self):
+        super().setUp()
+        self.logs = self.path("logs")
+        self.write("logs/old.log", age_days=30)
+        self.write("logs/done/old.log", age_days=30)
+        self.write("logs/todo/old.log", age_days=30)
+        self.checkpoint = dict(ticket_id="T-1", checkpoint=True, checkpoint_dir=self.path("state"),
+                               clear_temp=False, clear_cache=False, policy={"log_paths": [self.logs]})
+        self.journal = journal_path(self.path("state"), "T-1")
+
+    def settings(self, params):
+        cleanup = DiskCleanup()
+        cleanup.policy = CleanupPolicy.from_params(params)
+        cleanup.configure_log_mode(params)
+        return cleanup.journal_settings(params)
+
+    def write_journal(self, params, records, torn=None):
+        os.makedirs(os.path.dirname(self.journal), exist_ok=True)
+        with open(self.journal, 'w') as f:
+            f.write(json.dumps({"settings": self.settings(params)}) + "\n")
+            for path, scope, cleaned in records:
+                f.write(json.dumps({"task": f"logs:{self.logs}", "path": path,
+                                    "scope": scope, "bytes": cleaned}) + "\n")
+            if torn:
+                f.write(torn)
+
+    def test_resume_from_torn_journal(self):
+        params = self.params(**self.checkpoint)
+        done = self.path("logs", "done")
+        self.write_journal(params, [(done, "files", 100), (done, "tree", 0)],
+                           torn='{"task": "logs:')
+        result = self.run_cleanup(**params)
+        self.assertTrue(result["success"])
+        self.assertTrue(result["resumed"])
+        # The journaled subtree is skipped; its bytes still count
+        self.assertTrue(os.path.exists(self.path("logs", "done", "old.log")))
+        self.assertFalse(os.path.exists(self.path("logs", "todo", "old.log")))
+        self.assertEqual(result["cleaned_bytes"], 300)
+        self.assertFalse(os.path.exists(self.journal))
+
+    def test_appending_after_torn_line_starts_a_new_line(self):
+        params = self.params(**self.checkpoint)
+        self.write_journal(params, [(self.logs, "files", 1)], torn='{"task": "lo')
+        journal = CheckpointJournal(self.journal, settings=self.settings(params))
+        journal.mark_done(f"logs:{self.logs}", self.path("logs", "todo"), 5)
+        journal.close()
+        with open(self.journal) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[-2], '{"task": "lo')
+        self.assertEqual(json.loads(lines[-1])["bytes"], 5)
+
+    def test_changed_settings_start_over(self):
+        params = self.params(**self.checkpoint)
+        done = self.path("logs", "done")
+        self.write_journal(params, [(done, "tree", 100)])
+        result = self.run_cleanup(**dict(params, log_days_old=3))
+        self.assertFalse(result["resumed"])
+        self.assertFalse(os.path.exists(self.path("logs", "done", "old.log")))
+        self.assertIn("checkpoint_reset", [a["action"] for a in result["actions"]])
+
+    def test_resumed_total_without_pressure(self):
+        params = self.params(**dict(self.checkpoint, min_free_space_gb=0))
+        self.write_journal(params, [(self.path("logs", "done"), "tree", 4096)])
+        result = self.run_cleanup(**params)
+        self.assertEqual(result["cleaned_bytes"], 4096)
+        self.assertEqual(sum(m["cleaned_bytes"] for m in result["mounts"]), 4096)
+
+    def test_unwritable_checkpoint_dir_is_not_fatal(self):
+        blocker = self.write("not-a-dir")
+        result = self.run_cleanup(**dict(self.checkpoint, checkpoint_dir=os.path.join(blocker, "state")))
+        self.assertTrue(result["success"])
+        self.assertIn("warning", [a["action"] for a in result["actions"]])
+        self.assertFalse(os.path.exists(self.path("logs", "todo", "old.log")))
+
+    def test_records_are_flushed_on_a_timer(self):
+        journal = CheckpointJournal(self.journal, flush_interval=0.05)
+        self.addCleanup(journal.close)
+        journal.mark_done("logs:/x", "/x", 1)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with open(self.journal) as f:
+                if len(f.read().splitlines()) == 2:
+                    break
+            time.sleep(0.02)
+        else:
+            self.fail("record was not flushed")
+
+
+class CompressionTest(CleanupTestCase):
+    CONTENT = "GET /index.html 200\n" * 500
+
+    def test_compress_and_keep_metadata(self):
+        for codec, opener in (("gzip", gzip.open), ("xz", lzma.open)):
+            path = self.write(f"logs/{codec}.log", self.CONTENT, age_days=30)
+            os.chmod(path, 0o640)
+            before = os.stat(path)
+            result = compress_log_file(path, codec, level=0)
+            self.assertEqual(result["status"], "compressed", result["error"])
+            self.assertFalse(os.path.exists(path))
+            with opener(result["output"], 'rt') as f:
+                self.assertEqual(f.read(), self.CONTENT)
+            after = os.stat(result["output"])
+            self.assertEqual(after.st_mtime_ns, before.st_mtime_ns)
+            self.assertEqual(after.st_mode & 0o777, 0o640)
+
+    @unittest.skipUnless(hasattr(os, 'geteuid') and os.geteuid() == 0, "needs root to chown")
+    def test_owner_is_preserved(self):
+        path = self.write("logs/syslog.log", self.CONTENT)
+        os.chown(path, 1000, 4)
+        result = compress_log_file(path)
+        st = os.stat(result["output"])
+        self.assertEqual((st.st_uid, st.st_gid), (1000, 4))
+
+    def test_already_compressed_is_skipped(self):
+        path = self.path("logs", "rotated.log")
+        os.makedirs(os.path.dirname(path))
+        with gzip.open(path, 'wt') as f:
+            f.write(self.CONTENT)
+        result = compress_log_file(path)
+        self.assertEqual(result["status"], "skipped")
+        self.assertTrue(os.path.exists(path))
+
+    def test_recover_after_crash_before_removing_original(self):
+        path = self.write("logs/app.log", self.CONTENT)
+        with gzip.open(path + ".gz", 'wt') as f:
+            f.write(self.CONTENT)
+        with open(path + ".gz", 'rb') as f:
+            archive = f.read()
+        result = compress_log_file(path)
+        self.assertEqual(result["status"], "compressed")
+        self.assertFalse(os.path.exists(path))
+        with open(path + ".gz", 'rb') as f:
+            self.assertEqual(f.read(), archive)
+
+    def test_unrelated_or_broken_archive_is_never_replaced(self):
+        path = self.write("logs/app.log", self.CONTENT)
+        for existing in (gzip.compress(b"someone else's archive"), gzip.compress(self.CONTENT.encode())[:-10],
+                         b"not an archive"):
+            with open(path + ".gz", 'wb') as f:
+                f.write(existing)
+            result = compress_log_file(path)
+            self.assertEqual(result["status"], "skipped")
+            self.assertTrue(os.path.exists(path))
+            with open(path + ".gz", 'rb') as f:
+                self.assertEqual(f.read(), existing)
+
+    def test_pooled_walk_compresses_and_journals_each_directory(self):
+        logs = self.path("logs")
+        for relative in ("a.log", "sub/b.log", "sub/deep/c.log", "other/d.log"):
+            self.write(f"logs/{relative}", self.CONTENT, age_days=30)
+        records = []
+        real_mark_done = CheckpointJournal.mark_done
+
+        def mark_done(journal, task, path, cleaned_bytes=0, scope="tree"):
+            records.append((os.path.relpath(path, logs), scope))
+            real_mark_done(journal, task, path, cleaned_bytes, scope)
+
+        with mock.patch.object(CheckpointJournal, 'mark_done', mark_done):
+            result = self.run_cleanup(log_mode="compress", compression_workers=2, clear_temp=False,
+                                      clear_cache=False, ticket_id="T-2", checkpoint=True,
+                                      checkpoint_dir=self.path("state"), policy={"log_paths": [logs]})
+        self.assertTrue(result["success"], result.get("error"))
+        self.assertEqual(result["compression"]["files"], 4)
+        for relative in ("a.log", "sub/b.log", "sub/deep/c.log", "other/d.log"):
+            self.assertTrue(os.path.exists(os.path.join(logs, relative + ".gz")))
+        # A directory's tree record follows its own files record and its subdirectories' trees
+        for directory in (".", "sub", "sub/deep", "other"):
+            self.assertLess(records.index((directory, "files")), records.index((directory, "tree")))
+        self.assertLess(records.index(("sub/deep", "tree")), records.index(("sub", "tree")))
+        self.assertEqual(records[-1], (".", "tree"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Tests for the password reset engine, run against the in-process local backend
+"""
+
+import os
+import sys
+import threading
+import unittest
+import importlib.util
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from password_reset import (PasswordReset, LocalDirectoryBackend, LDAPDirectoryBackend,
+                            create_backend)
+
+
+def users(count):
+    return [f"user{i}@corp.com" for i in range(count)]
+
+
+class RecordingBackend(LocalDirectoryBackend):
+    """Local backend that records batch sizes and can fail on demand"""
+
+    def __init__(self, fail_times=0, poison=None, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+        self.fail_times = fail_times
+        self.poison = poison
+
+    def reset_batch(self, conn, requests):
+        with self.lock:
+            self.batches.append(len(requests))
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("connection reset by peer")
+        if self.poison and any(r["user"] == self.poison for r in requests):
+            raise ConnectionError("directory rejected the batch")
+        return super().reset_batch(conn, requests)
+
+
+class RecordingDelivery:
+    def __init__(self, fail=False):
+        self.delivered = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def deliver(self, request):
+        if self.fail:
+            raise ConnectionError("delivery service down")
+        with self.lock:
+            self.delivered.append(request)
+
+
+def run(backend, delivery=None, **params):
+    params.setdefault('rate_limit_per_second', 0)
+    with mock.patch('sys.stdout'):
+        return PasswordReset(backend=backend, delivery=delivery).reset_passwords(params)
+
+
+class BatchingTest(unittest.TestCase):
+    def test_users_are_split_into_batches(self):
+        backend = RecordingBackend()
+        result = run(backend, users=users(120), batch_size=50, pool_size=2)
+        self.assertTrue(result["success"])
+        self.assertEqual(sorted(backend.batches), [20, 50, 50])
+        self.assertEqual([r["user"] for r in result["results"]], users(120))
+        self.assertLessEqual(backend.connections_opened, 2)
+
+    def test_duplicates_and_invalid_addresses(self):
+        backend = RecordingBackend()
+        result = run(backend, users=["A@corp.com", "a@corp.com", "not-an-email"])
+        self.assertEqual(result["total_users"], 2)
+        self.assertEqual(result["summary"], {"success": 1, "invalid": 1})
+        self.assertFalse(result["success"])
+
+    def test_unknown_users_are_not_found(self):
+        backend = RecordingBackend(users=["known@corp.com"])
+        result = run(backend, users=["known@corp.com", "ghost@corp.com"])
+        self.assertEqual([r["status"] for r in result["results"]], ["success", "not_found"])
+
+    def test_collect_users_leaves_caller_list_alone(self):
+        given = ["a@corp.com"]
+        PasswordReset().collect_users({"users": given, "user_email": "b@corp.com"})
+        self.assertEqual(given, ["a@corp.com"])
+
+
+class RetryTest(unittest.TestCase):
+    def test_transient_failure_is_retried(self):
+        backend = RecordingBackend(fail_times=2)
+        result = run(backend, users=users(10), batch_size=10, pool_size=1, max_retries=2)
+        self.assertTrue(result["success"])
+        self.assertEqual(backend.batches, [10, 10, 10])
+        warnings = [a for a in result["actions"] if a["action"] == "warning"]
+        self.assertEqual(len(warnings), 2)
+
+    def test_exhausted_batch_fails_without_losing_others(self):
+        backend = RecordingBackend(poison="user3@corp.com")
+        result = run(backend, users=users(10), batch_size=5, pool_size=2, max_retries=1)
+        self.assertFalse(result["success"])
+        self.assertEqual(result["summary"], {"failed": 5, "success": 5})
+        statuses = {r["user"]: r["status"] for r in result["results"]}
+        self.assertEqual(statuses["user3@corp.com"], "failed")
+        self.assertEqual(statuses["user7@corp.com"], "success")
+
+    def test_connection_failure_reports_each_user(self):
+        backend = RecordingBackend()
+        with mock.patch.object(backend, 'connect', side_effect=ConnectionError("refused")):
+            result = run(backend, users=users(4), batch_size=2, max_retries=1)
+        self.assertEqual(result["summary"], {"failed": 4})
+        self.assertTrue(all("refused" in r["message"] for r in result["results"]))
+
+
+class DeliveryTest(unittest.TestCase):
+    def test_local_results_are_labelled_dry_run(self):
+        result = run(RecordingBackend(), users=users(1))
+        self.assertTrue(result["dry_run"])
+        self.assertTrue(result["results"][0]["dry_run"])
+        self.assertIn("Dry run", result["results"][0]["message"])
+
+    def test_temporary_password_goes_through_delivery_hook(self):
+        delivery = RecordingDelivery()
+        result = run(RecordingBackend(), delivery=delivery, users=users(3),
+                     reset_type="temporary_password", notify_user=False)
+        self.assertTrue(result["success"])
+        self.assertEqual(len(delivery.delivered), 3)
+        self.assertTrue(all(r["notified"] for r in result["results"]))
+
+    def test_failed_delivery_is_reported(self):
+        result = run(RecordingBackend(), delivery=RecordingDelivery(fail=True), users=users(1),
+                     reset_type="temporary_password", notify_user=False)
+        self.assertEqual(result["results"][0]["status"], "delivery_failed")
+        self.assertFalse(result["results"][0].get("notified"))
+
+    def test_undeliverable_temporary_password_is_rejected(self):
+        backend = RecordingBackend()
+        result = run(backend, users=users(1), reset_type="temporary_password", notify_user=False)
+        self.assertFalse(result["success"])
+        self.assertEqual(backend.batches, [])
+
+
+class CreateBackendTest(unittest.TestCase):
+    def test_missing_backend_is_an_error(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            with self.assertRaises(ValueError):
+                create_backend({})
+
+    def test_local_backend_needs_dry_run(self):
+        with self.assertRaises(ValueError):
+            create_backend({"backend": "local"})
+        self.assertIsInstance(create_backend({"dry_run": True}), LocalDirectoryBackend)
+
+    def test_environment_selects_backend(self):
+        with mock.patch.dict(os.environ, {"PASSWORD_RESET_BACKEND": "ldap"}):
+            self.assertIsInstance(create_backend({}), LDAPDirectoryBackend)
+
+
+class LDAPSearchTest(unittest.TestCase):
+    @unittest.skipUnless(importlib.util.find_spec('ldap3'), "ldap3 not installed")
+    def test_failed_search_raises(self):
+        backend = LDAPDirectoryBackend("ldap://dir", "cn=admin", "secret", "dc=corp")
+        conn = mock.Mock(entries=[], result={"result": 4, "description": "sizeLimitExceeded"})
+        with self.assertRaises(Exception):
+            backend.reset_batch(conn, [{"user": "a@corp.com", "reset_type": "temporary_password",
+                                        "force_change": False, "notify_user": False,
+                                        "password": "x"}])
+
+
+if __name__ == "__main__":
+    unittest.main()